@@ -1,23 +1,72 @@
 #!/usr/bin/env python3
+import argparse
+import atexit
+import csv
+import gzip
+import hashlib
+import html
+import itertools
 import json
+import math
+import queue
+import random
+import shutil
+import threading
 import time
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+from urllib.parse import urlsplit
 import os
+import platform
+import sqlite3
+import statistics
+import subprocess
 import sys
+from collections import Counter, deque
+from contextlib import contextmanager, nullcontext
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
-try:
-    import readchar
-except ImportError:
-    print("Installing readchar...")
-    os.system(f"{sys.executable} -m pip install readchar -q")
-    import readchar
+readchar = None
+
+def load_readchar():
+    # Only the interactive menu needs readchar; headless runs never import it
+    global readchar
+    if readchar is None:
+        try:
+            import readchar as module
+        except ImportError:
+            print("Installing readchar...")
+            os.system(f"{sys.executable} -m pip install readchar -q")
+            import readchar as module
+        readchar = module
+    return readchar
 
 CONFIG_FILE = Path.home() / ".llm-benchmark-config.json"
 PROMPTS_DIR = Path(__file__).parent / "prompts"
 RESULTS_FILE = Path(__file__).parent / "results.txt"
+RESULTS_DB = Path(__file__).parent / "results.db"
 TEMP_DIR = Path(__file__).parent / "temp"
+TOKEN_INDEX_FILE = TEMP_DIR / "token_index.json"
+PROMPT_STORE_DIR = TEMP_DIR / "prompt_store"
+ARTIFACTS_FILE = "artifacts.jsonl.gz"
+
+BENCHMARK_MODES = [
+    "Standard (sequential iterations)",
+    "Load test (concurrency sweep)",
+    "Open-loop arrival rate (SLO)",
+    "Cold start (model load latency)",
+    "Prefix cache reuse (shared long prefix)",
+    "Context length sweep (synthetic prompts)",
+    "Parameter sweep (sampling and server options)",
+    "Fixed output length (decode comparison)",
+    "Embeddings throughput (batch sizes)",
+]
 
 DEFAULT_CONFIG = {
     "ollama_url": "http://localhost:11434",
@@ -28,6 +77,60 @@ DEFAULT_CONFIG = {
     "max_tokens": 8192,
     "top_p": 0.95,
     "repeat_penalty": 1.1,
+    "streaming": False,
+    "warmup_runs": 1,
+    "adaptive_iterations": False,
+    "target_ci_pct": 5.0,
+    "max_runs": 20,
+    "max_time": 300,
+    "outlier_rejection": True,
+    "cold_start_cycles": 1,
+    "cold_start_steady_runs": 3,
+    "prefix_cache_suffixes": [
+        "Summarize the text above in three sentences.",
+        "List the five most important names or terms mentioned above.",
+        "What is the main problem described above?",
+        "Suggest one improvement based on the text above.",
+    ],
+    "prefix_cache_max_tokens": 64,
+    "prefix_cache_ollama_context": False,
+    "context_sweep_lengths": [512, 1024, 2048, 4096, 8192, 16384, 32768, 65536, 131072],
+    "context_sweep_max_tokens": 128,
+    "sweep_grid": {"num_thread": [4, 8], "num_batch": [256, 512]},
+    "sweep_iterations": 2,
+    "sweep_latency_budget": None,
+    "fixed_output_tokens": 512,
+    "fixed_output_seed": 42,
+    "embed_chunk_sizes": [256, 512],
+    "embed_batch_sizes": [1, 8, 32],
+    "embed_concurrency": 4,
+    "embed_max_chunks": 512,
+    "concurrency_levels": [1, 2, 4, 8, 16],
+    "load_rounds": 2,
+    "open_loop_rates": [0.5, 1, 2, 4],
+    "open_loop_duration": 30,
+    "open_loop_arrival": "poisson",
+    "open_loop_max_inflight": 256,
+    "prompt_weights": {},
+    "slo_ttft": 2.0,
+    "slo_latency": 30.0,
+    "slo_target": 0.9,
+    "live_dashboard": True,
+    "dashboard_window": 60,
+    "fleet_server_concurrency": 1,
+    "artifacts": "jsonl",
+    "resource_sampling": True,
+    "resource_sample_interval": 0.5,
+    "resource_processes": ["llama-server", "ollama", "ollama_llama_server", "lms", "lmstudio"],
+    "probe_set": [],
+    "probe_interval": 60,
+    "probe_max_tokens": 64,
+    "metrics_host": "127.0.0.1",
+    "metrics_port": 9464,
+    "http_pool_size": 32,
+    "http_retries": 2,
+    "connect_timeout": 5,
+    "read_timeout": 600,
     "remote_servers": [],
     "custom_models": {}
 }
@@ -45,6 +148,78 @@ def load_config():
 def save_config(config):
     CONFIG_FILE.write_text(json.dumps(config, indent=2))
 
+_http_config = {}
+_http_sessions = {}
+_http_lock = threading.Lock()
+_http_local = threading.local()
+
+class TimedHTTPConnection(HTTPConnection):
+    # Adds the TCP handshake of every new connection to the calling thread's counter
+    def connect(self):
+        start = time.perf_counter()
+        super().connect()
+        _http_local.connect_time = getattr(_http_local, "connect_time", 0) + time.perf_counter() - start
+
+class TimedHTTPSConnection(HTTPSConnection):
+    # Same for TCP + TLS handshakes
+    def connect(self):
+        start = time.perf_counter()
+        super().connect()
+        _http_local.connect_time = getattr(_http_local, "connect_time", 0) + time.perf_counter() - start
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+class TimedHTTPAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": TimedHTTPConnectionPool,
+            "https": TimedHTTPSConnectionPool,
+        }
+
+def configure_http(config):
+    # Enough pooled connections for the widest concurrency level, so none get discarded
+    _http_config["pool_size"] = max([config["http_pool_size"]] + list(config["concurrency_levels"]))
+    _http_config["retries"] = config["http_retries"]
+    _http_config["timeout"] = (config["connect_timeout"], config["read_timeout"])
+
+def http_session(url):
+    # One keep-alive session per server, shared by every run and thread
+    parts = urlsplit(url)
+    key = f"{parts.scheme}://{parts.netloc}"
+    with _http_lock:
+        session = _http_sessions.get(key)
+        if session is None:
+            if not _http_config:
+                configure_http(DEFAULT_CONFIG)
+            # Only failed connection attempts are retried; the request never reached the server
+            retry = Retry(total=_http_config["retries"], connect=_http_config["retries"], read=0,
+                          status=0, other=0, backoff_factor=0.2, allowed_methods=None)
+            adapter = TimedHTTPAdapter(pool_connections=1, pool_maxsize=_http_config["pool_size"],
+                                       max_retries=retry)
+            session = requests.Session()
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _http_sessions[key] = session
+    return session
+
+def request_timeout():
+    if not _http_config:
+        configure_http(DEFAULT_CONFIG)
+    return _http_config["timeout"]
+
+def reset_connect_time():
+    _http_local.connect_time = 0
+
+def take_connect_time():
+    connect_time = getattr(_http_local, "connect_time", 0)
+    _http_local.connect_time = 0
+    return connect_time
+
 def get_prompts():
     if not PROMPTS_DIR.exists():
         return []
@@ -57,6 +232,127 @@ def count_tokens(text):
     # Simple approximation: ~4 chars per token
     return len(text) // 4
 
+_token_index = None
+_token_index_lock = threading.Lock()
+
+def load_token_index():
+    global _token_index
+    if _token_index is None:
+        try:
+            _token_index = json.loads(TOKEN_INDEX_FILE.read_text())
+        except (OSError, ValueError):
+            _token_index = {}
+        _token_index.setdefault("files", {})
+        _token_index.setdefault("counts", {})
+    return _token_index
+
+def save_token_index():
+    TOKEN_INDEX_FILE.parent.mkdir(parents=True, exist_ok=True)
+    TOKEN_INDEX_FILE.write_text(json.dumps(_token_index, indent=1))
+
+def prompt_file_hash(prompt_file):
+    # The content hash is only recomputed when the file's mtime or size changed
+    index = load_token_index()
+    stat = (PROMPTS_DIR / prompt_file).stat()
+    entry = index["files"].get(prompt_file)
+    if entry and entry["mtime"] == stat.st_mtime and entry["size"] == stat.st_size:
+        return entry["sha256"], False
+    digest = hashlib.sha256(load_prompt(prompt_file).encode("utf-8")).hexdigest()
+    index["files"][prompt_file] = {"mtime": stat.st_mtime, "size": stat.st_size, "sha256": digest}
+    return digest, True
+
+def tokenizer_key(backend, model):
+    return f"{backend}:{model}"
+
+def reported_key(tokenizer):
+    # Counts reported by a generation include the chat template (and on some backends
+    # reflect prompt cache reuse), so they never share a key with raw /tokenize counts
+    return f"{tokenizer}|reported"
+
+def prompt_token_count(prompt_file, tokenizer=None, fetch=None):
+    """Token count of a prompt file from the on-disk index.
+    
+    Returns (count, exact). With a tokenizer key the raw tokenizer count is used when known,
+    otherwise fetch(text) is asked for it, then a count reported by an earlier run;
+    the ~4 chars/token estimate is the fallback.
+    """
+    with _token_index_lock:
+        index = load_token_index()
+        digest, changed = prompt_file_hash(prompt_file)
+        counts = index["counts"].setdefault(digest, {})
+        if tokenizer and tokenizer in counts:
+            if changed:
+                save_token_index()
+            return counts[tokenizer], True
+        if tokenizer and fetch:
+            count, reported = fetch(load_prompt(prompt_file))
+            if count is not None:
+                counts[reported_key(tokenizer) if reported else tokenizer] = count
+                save_token_index()
+                return count, True
+        if tokenizer and reported_key(tokenizer) in counts:
+            if changed:
+                save_token_index()
+            return counts[reported_key(tokenizer)], True
+        if "approx" not in counts:
+            counts["approx"] = count_tokens(load_prompt(prompt_file))
+            changed = True
+        if changed:
+            save_token_index()
+        return counts["approx"], False
+
+def remember_prompt_tokens(prompt_file, tokenizer, count):
+    # Runs report the server's real prompt token count; keep it for the menus and reports
+    if not count or not (PROMPTS_DIR / prompt_file).exists():
+        return
+    with _token_index_lock:
+        index = load_token_index()
+        digest, _ = prompt_file_hash(prompt_file)
+        counts = index["counts"].setdefault(digest, {})
+        key = reported_key(tokenizer)
+        # A cache hit can lower the reported count, the largest one is the full prompt
+        if count > counts.get(key, 0):
+            counts[key] = count
+            save_token_index()
+
+def tokenize_endpoint(url, text):
+    # llama.cpp server tokenizer; None when the backend has no such endpoint
+    try:
+        r = http_session(url).post(f"{url}/tokenize", json={"content": text}, timeout=30)
+        if r.ok:
+            return len(r.json()["tokens"])
+    except Exception:
+        pass
+    return None
+
+def tokenize_probe(backend, url, model, text):
+    # Exact count via a one-token generation; includes the chat template for OpenAI backends
+    if backend == "ollama":
+        r = http_session(url).post(f"{url}/api/generate", json={
+            "model": model, "prompt": text, "stream": False, "options": {"num_predict": 1}},
+            timeout=request_timeout())
+        r.raise_for_status()
+        return r.json().get("prompt_eval_count")
+    r = http_session(url).post(f"{url}/v1/chat/completions", json={
+        "model": model, "messages": [{"role": "user", "content": text}], "max_tokens": 1},
+        timeout=request_timeout())
+    r.raise_for_status()
+    return r.json().get("usage", {}).get("prompt_tokens")
+
+def backend_token_counter(backend, url, model, probe=False):
+    # fetch(text) -> (count, reported); probe counts come from a generation, like run-reported ones
+    def fetch(text):
+        count = None if backend == "ollama" else tokenize_endpoint(url, text)
+        if count is None and probe:
+            return tokenize_probe(backend, url, model, text), True
+        return count, False
+    return fetch
+
+def clear_screen():
+    # ANSI home + erase instead of spawning a shell for "clear"
+    sys.stdout.write("\033[H\033[2J")
+    sys.stdout.flush()
+
 def format_prompt_preview(prompt):
     lines = prompt.split('\n')
     if len(lines) <= 10:
@@ -66,9 +362,10 @@ def format_prompt_preview(prompt):
     preview += '\n'.join(lines[-5:])
     return preview
 
-def save_result(backend, model, prompt_file, prompt, results, iterations):
+def save_result(backend, model, prompt_file, prompt, results, iterations, rejected=(), warmup_runs=0):
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    prompt_tokens = count_tokens(prompt)
+    reported = [r["prompt_tokens"] for r in results if r.get("prompt_tokens")]
+    prompt_tokens = max(reported) if reported else f"~{count_tokens(prompt)}"
     prompt_chars = len(prompt)
     prompt_lines = len(prompt.split('\n'))
     
@@ -80,8 +377,11 @@ def save_result(backend, model, prompt_file, prompt, results, iterations):
         f.write(f"Backend: {backend.upper()}\n")
         f.write(f"Model: {model}\n")
         f.write(f"Prompt File: {prompt_file}\n")
-        f.write(f"Prompt Stats: {prompt_chars} chars, {prompt_lines} lines, ~{prompt_tokens} tokens\n")
-        f.write(f"Iterations: {iterations}\n\n")
+        f.write(f"Prompt Stats: {prompt_chars} chars, {prompt_lines} lines, {prompt_tokens} tokens\n")
+        f.write(f"Iterations: {iterations}\n")
+        if warmup_runs:
+            f.write(f"Warm-up Runs (discarded): {warmup_runs}\n")
+        f.write("\n")
         
         f.write("PROMPT PREVIEW:\n")
         f.write("-" * 80 + "\n")
@@ -89,25 +389,561 @@ def save_result(backend, model, prompt_file, prompt, results, iterations):
         f.write("-" * 80 + "\n\n")
         
         f.write("RESULTS:\n")
-        for i, (elapsed, tokens, tps) in enumerate(results, 1):
-            f.write(f"  Run {i}: {tps:.2f} tok/s ({tokens} tokens in {elapsed:.2f}s)\n")
+        for i, metrics in enumerate(results):
+            note = " (outlier, excluded)" if i in rejected else ""
+            f.write(f"  Run {metrics.get('run', i + 1)}: {format_metrics(metrics)}{note}\n")
+            if metrics.get("resources"):
+                f.write(f"         {format_resources(metrics)}\n")
         
+        results = [r for i, r in enumerate(results) if i not in rejected]
+        if rejected:
+            f.write(f"\nOUTLIERS EXCLUDED: {len(rejected)}\n")
         if results:
-            avg_tps = sum(r[2] for r in results) / len(results)
-            avg_time = sum(r[0] for r in results) / len(results)
-            total_tokens = sum(r[1] for r in results)
+            avg_tps = average_metric(results, "tps")
+            avg_time = average_metric(results, "elapsed")
+            total_tokens = sum(r["tokens"] for r in results)
             f.write(f"\nAVERAGE: {avg_tps:.2f} tok/s\n")
             f.write(f"AVG TIME: {avg_time:.2f}s\n")
             f.write(f"TOTAL OUTPUT TOKENS: {total_tokens}\n")
+            
+            avg_ttft = average_metric(results, "ttft")
+            avg_prefill = average_metric(results, "prefill_tps")
+            avg_decode = average_metric(results, "decode_tps")
+            if avg_ttft is not None:
+                f.write(f"AVG TTFT: {avg_ttft * 1000:.0f}ms\n")
+            if avg_prefill is not None:
+                f.write(f"AVG PREFILL: {avg_prefill:.2f} tok/s\n")
+            if avg_decode is not None:
+                f.write(f"AVG DECODE: {avg_decode:.2f} tok/s\n")
+            itl = [gap for r in results for gap in r.get("itl", [])]
+            if itl:
+                f.write(f"ITL p50/p95/p99: {percentile(itl, 50) * 1000:.1f}/"
+                        f"{percentile(itl, 95) * 1000:.1f}/{percentile(itl, 99) * 1000:.1f}ms\n")
+            resources = summarize_resources(results)
+            if resources:
+                f.write(f"AVG CPU: {resources['cpu_cores']:.2f} cores, RSS {resources['rss_gb']:.2f}GB\n")
+                if resources["tps_per_core"]:
+                    f.write(f"TOK/S PER CORE: {resources['tps_per_core']:.2f}\n")
+                if resources["tps_per_gb"]:
+                    f.write(f"TOK/S PER GB: {resources['tps_per_gb']:.2f}"
+                            f" (~{resources['weight_read_gbps']:.1f} GB/s weight reads)\n")
         
         f.write("\n\n")
 
+RUN_COLUMNS = [
+    "timestamp", "session", "mode", "backend", "url", "model", "prompt_file", "run",
+    "concurrency", "params", "variant", "elapsed", "tokens", "tps", "prompt_tokens", "ttft",
+    "prefill_tps", "decode_tps", "latency", "error", "host", "git_rev", "extra", "outlier",
+]
+
+SAMPLING_KEYS = ["temperature", "max_tokens", "top_p", "repeat_penalty", "streaming"]
+# Columns added after the first release; older databases get them through ALTER TABLE
+RUN_COLUMN_MIGRATIONS = {
+    "variant": "TEXT",
+    "outlier": "INTEGER NOT NULL DEFAULT 0",
+}
+# Runs rejected as outliers stay in results.db but are left out of comparisons and reports
+NOT_OUTLIER_SQL = "outlier = 0"
+
+_db = None
+_db_lock = threading.Lock()
+_host_info = None
+
+def open_results_db():
+    global _db
+    if _db is None:
+        _db = sqlite3.connect(RESULTS_DB, check_same_thread=False)
+        _db.row_factory = sqlite3.Row
+        # WAL keeps inserts cheap and lets query/report read while a benchmark writes
+        _db.execute("PRAGMA journal_mode=WAL")
+        _db.execute("PRAGMA synchronous=NORMAL")
+        _db.executescript("""
+            CREATE TABLE IF NOT EXISTS runs (
+                id INTEGER PRIMARY KEY,
+                timestamp TEXT NOT NULL,
+                session TEXT,
+                mode TEXT,
+                backend TEXT,
+                url TEXT,
+                model TEXT,
+                prompt_file TEXT,
+                run TEXT,
+                concurrency INTEGER,
+                params TEXT,
+                variant TEXT,
+                elapsed REAL,
+                tokens INTEGER,
+                tps REAL,
+                prompt_tokens INTEGER,
+                ttft REAL,
+                prefill_tps REAL,
+                decode_tps REAL,
+                latency REAL,
+                error TEXT,
+                host TEXT,
+                git_rev TEXT,
+                extra TEXT,
+                outlier INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS runs_model_prompt_time ON runs (model, prompt_file, timestamp);
+            CREATE INDEX IF NOT EXISTS runs_session ON runs (session);
+            CREATE INDEX IF NOT EXISTS runs_time ON runs (timestamp);
+        """)
+        existing = {row["name"] for row in _db.execute("PRAGMA table_info(runs)")}
+        for column, decl in RUN_COLUMN_MIGRATIONS.items():
+            if column not in existing:
+                _db.execute(f"ALTER TABLE runs ADD COLUMN {column} {decl}")
+                if column == "outlier":
+                    # Before the column existed the flag lived in the extra JSON
+                    _db.execute("""UPDATE runs SET outlier = 1 WHERE extra LIKE '%"outlier": true%'""")
+        _db.execute("CREATE INDEX IF NOT EXISTS runs_outlier ON runs (outlier)")
+        _db.commit()
+    return _db
+
+def get_host_info():
+    global _host_info
+    if _host_info is None:
+        try:
+            git_rev = subprocess.run(
+                ["git", "rev-parse", "--short", "HEAD"], cwd=Path(__file__).parent,
+                capture_output=True, text=True, timeout=5,
+            ).stdout.strip() or None
+        except Exception:
+            git_rev = None
+        _host_info = {
+            "host": {
+                "hostname": platform.node(),
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+                "python": platform.python_version(),
+            },
+            "git_rev": git_rev,
+        }
+    return _host_info
+
+def record_run(mode, backend, url, model, prompt_file, run, session_dir, config,
+               metrics=None, error=None, concurrency=1, extra=None, variant=None):
+    # variant tells apart runs of one mode that measure different things (rate, batch size, cold/warm)
+    metrics = metrics or {}
+    info = get_host_info()
+    extra = dict(extra or {})
+    params = {k: config.get(k) for k in SAMPLING_KEYS}
+    # Request overrides such as Ollama options are part of the workload, not just metadata
+    request = extra.pop("request", None)
+    if request:
+        params["request"] = request
+    if metrics.get("itl"):
+        extra["itl"] = metrics["itl"]
+    if metrics.get("server"):
+        extra["server"] = metrics["server"]
+    if metrics.get("connect_time"):
+        extra["connect_time"] = metrics["connect_time"]
+    if metrics.get("resources"):
+        extra["resources"] = metrics["resources"]
+    row = {
+        "timestamp": datetime.now().isoformat(timespec="milliseconds"),
+        "session": session_dir.name if session_dir else None,
+        "mode": mode,
+        "backend": backend,
+        "url": url,
+        "model": model,
+        "prompt_file": prompt_file,
+        "run": str(run),
+        "concurrency": concurrency,
+        "params": json.dumps(params),
+        "variant": variant,
+        "elapsed": metrics.get("elapsed"),
+        "tokens": metrics.get("tokens"),
+        "tps": metrics.get("tps"),
+        "prompt_tokens": metrics.get("prompt_tokens"),
+        "ttft": metrics.get("ttft"),
+        "prefill_tps": metrics.get("prefill_tps"),
+        "decode_tps": metrics.get("decode_tps"),
+        "latency": metrics.get("latency"),
+        "error": error,
+        "host": json.dumps(info["host"]),
+        "git_rev": info["git_rev"],
+        "extra": json.dumps(extra) if extra else None,
+        "outlier": 0,
+    }
+    with _db_lock:
+        db = open_results_db()
+        cursor = db.execute(
+            f"INSERT INTO runs ({', '.join(RUN_COLUMNS)}) VALUES ({', '.join('?' * len(RUN_COLUMNS))})",
+            [row[c] for c in RUN_COLUMNS],
+        )
+        db.commit()
+    return cursor.lastrowid
+
+def mark_outlier(run_id):
+    # Outlier rejection only happens once all runs of a benchmark are in
+    with _db_lock:
+        db = open_results_db()
+        db.execute("UPDATE runs SET outlier = 1 WHERE id = ?", (run_id,))
+        db.commit()
+
+def build_run_filter(args):
+    clauses, values = [], []
+    for column, value in (("backend", args.backend), ("session", args.session), ("mode", args.mode)):
+        if value:
+            clauses.append(f"{column} = ?")
+            values.append(value)
+    if args.model:
+        clauses.append("model LIKE ?")
+        values.append(f"%{args.model}%")
+    if args.prompt:
+        clauses.append("prompt_file LIKE ?")
+        values.append(f"%{args.prompt}%")
+    if args.since:
+        clauses.append("timestamp >= ?")
+        values.append(args.since)
+    if args.until:
+        clauses.append("timestamp < ?")
+        values.append(args.until)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    return where, values
+
+def format_optional(value, fmt, scale=1):
+    return format(value * scale, fmt) if value is not None else "-"
+
+def query_runs(args):
+    if not RESULTS_DB.exists():
+        print(f"❌ No results database at {RESULTS_DB}")
+        return 1
+    db = open_results_db()
+    where, values = build_run_filter(args)
+    
+    if args.raw:
+        cursor = db.execute(
+            f"SELECT timestamp, session, backend, model, prompt_file, run, tps, ttft, decode_tps, error "
+            f"FROM runs {where} ORDER BY timestamp DESC LIMIT ?", values + [args.limit])
+        for row in cursor:
+            status = f"❌ {row['error']}" if row["error"] else (
+                f"{row['tps']:.2f} tok/s | TTFT {format_optional(row['ttft'], '.0f', 1000)}ms"
+                f" | decode {format_optional(row['decode_tps'], '.1f')} tok/s")
+            print(f"{row['timestamp']} | {row['session']} | {row['backend']:<10} | {row['model']:<30}"
+                  f" | {row['prompt_file']:<30} | run {row['run']:<6} | {status}")
+        return 0
+    
+    group_by = [c.strip() for c in args.group_by.split(",")]
+    unknown = [c for c in group_by if c not in RUN_COLUMNS]
+    if unknown:
+        print(f"❌ Unknown group-by column(s): {', '.join(unknown)}")
+        return 1
+    columns = ", ".join(group_by)
+    # Aggregation runs inside SQLite so large histories never get loaded into Python
+    cursor = db.execute(
+        f"SELECT {columns}, COUNT(*) AS runs, COUNT(error) AS errors, AVG(tps) AS tps, "
+        f"AVG(ttft) AS ttft, AVG(prefill_tps) AS prefill_tps, AVG(decode_tps) AS decode_tps, "
+        f"MIN(timestamp) AS first, MAX(timestamp) AS last "
+        f"FROM runs {where} GROUP BY {columns} ORDER BY tps DESC LIMIT ?", values + [args.limit])
+    
+    for i, row in enumerate(cursor, 1):
+        key = " | ".join(f"{row[c]}" for c in group_by)
+        print(f"{i}. {key} | {row['runs']} runs, {row['errors']} errors"
+              f" | {format_optional(row['tps'], '.2f')} tok/s"
+              f" | TTFT {format_optional(row['ttft'], '.0f', 1000)}ms"
+              f" | prefill {format_optional(row['prefill_tps'], '.1f')} tok/s"
+              f" | decode {format_optional(row['decode_tps'], '.1f')} tok/s"
+              f" | {row['first'][:16]} → {row['last'][:16]}")
+    return 0
+
+COMPARE_METRICS = {
+    # metric -> True when higher is better
+    "tps": True,
+    "decode_tps": True,
+    "prefill_tps": True,
+    "ttft": False,
+    "latency": False,
+}
+
+def parse_result_set(spec):
+    # "20240501_120000" (session), "git:abc123" (git revision) or "2024-05-01..2024-05-08" (time range)
+    if spec.startswith("git:"):
+        return "git_rev = ?", [spec[4:]]
+    if ".." in spec:
+        since, until = spec.split("..", 1)
+        return "timestamp >= ? AND timestamp < ?", [since, until]
+    return "session = ?", [spec]
+
+def load_result_set(spec, metric, args):
+    where, values = build_run_filter(args)
+    clause, spec_values = parse_result_set(spec)
+    where = f"{where} AND {clause}" if where else f"WHERE {clause}"
+    cursor = open_results_db().execute(
+        f"SELECT backend, model, prompt_file, mode, concurrency, variant, params, {metric} AS value FROM runs "
+        f"{where} AND error IS NULL AND {metric} IS NOT NULL AND {NOT_OUTLIER_SQL}", values + spec_values)
+    groups = {}
+    for row in cursor:
+        # Modes, load levels, variants and settings measure different things, never pool them into one sample
+        key = (row["backend"], row["model"], row["prompt_file"], row["mode"], row["concurrency"] or 1,
+               row["variant"] or "", row["params"] or "{}")
+        groups.setdefault(key, []).append(row["value"])
+    return groups
+
+def flatten_params(params):
+    # Sampling settings plus the request overrides, with Ollama options lifted to the top level
+    params = json.loads(params or "{}")
+    request = params.pop("request", None) or {}
+    params.update(request.get("options") or {})
+    params.update({k: v for k, v in request.items() if k != "options"})
+    return params
+
+def bootstrap_change_ci(baseline, candidate, confidence, resamples=2000):
+    # Percent change of the median with a percentile bootstrap interval
+    rng = random.Random(0)
+    base_median = statistics.median(baseline)
+    changes = []
+    for _ in range(resamples):
+        b = statistics.median(rng.choices(baseline, k=len(baseline)))
+        c = statistics.median(rng.choices(candidate, k=len(candidate)))
+        if b:
+            changes.append((c - b) / b * 100)
+    change = (statistics.median(candidate) - base_median) / base_median * 100 if base_median else 0
+    tail = (1 - confidence) / 2 * 100
+    return change, percentile(changes, tail), percentile(changes, 100 - tail)
+
+def compare_runs(args):
+    if not RESULTS_DB.exists():
+        print(f"❌ No results database at {RESULTS_DB}")
+        return 1
+    metric = args.metric
+    higher_is_better = COMPARE_METRICS[metric]
+    baseline = load_result_set(args.baseline, metric, args)
+    candidate = load_result_set(args.candidate, metric, args)
+    
+    common = sorted(set(baseline) & set(candidate))
+    if not common:
+        print("❌ No backend/model/prompt/mode/settings combination present in both result sets")
+        return 1
+    
+    print(f"📊 {metric}: {args.baseline} → {args.candidate} "
+          f"(threshold {args.threshold}%, {args.confidence * 100:.0f}% bootstrap CI)\n")
+    siblings = {}
+    for key in common:
+        siblings.setdefault(key[:6], []).append(flatten_params(key[6]))
+    
+    def settings(key):
+        # Only the settings that tell this group apart from others of the same model/prompt/mode
+        group, mine = siblings[key[:6]], flatten_params(key[6])
+        names = dict.fromkeys(k for p in group for k in p)
+        return format_params({k: mine.get(k) for k in names if len({json.dumps(p.get(k)) for p in group}) > 1})
+    
+    regressions = 0
+    for key in common:
+        base, cand = baseline[key], candidate[key]
+        base_sd = statistics.stdev(base) if len(base) > 1 else 0
+        cand_sd = statistics.stdev(cand) if len(cand) > 1 else 0
+        variant = " ".join(filter(None, [key[5], settings(key)]))
+        line = (f"{key[0]:<10} | {key[1]:<30} | {key[2]:<30} | {key[3] or '-':<13} c={key[4]:<3}"
+                f"{f' {variant}' if variant else ''}"
+                f" | {statistics.median(base):>9.4g} ±{base_sd:<7.3g} (n={len(base)})"
+                f" → {statistics.median(cand):>9.4g} ±{cand_sd:<7.3g} (n={len(cand)})")
+        if len(base) < 2 or len(cand) < 2:
+            print(f"{line} | ❔ not enough runs")
+            continue
+        change, low, high = bootstrap_change_ci(base, cand, args.confidence)
+        line += f" | {change:+6.1f}% [{low:+.1f}, {high:+.1f}]"
+        # Normalize so that negative always means "worse"
+        sign = 1 if higher_is_better else -1
+        gain, gain_low, gain_high = sign * change, min(sign * low, sign * high), max(sign * low, sign * high)
+        if gain_high < 0 and gain <= -args.threshold:
+            regressions += 1
+            print(f"{line} | ⚠️  REGRESSION")
+        elif gain_low > 0 and gain >= args.threshold:
+            print(f"{line} | 🚀 improvement")
+        else:
+            print(f"{line} | ✅ no significant change")
+    
+    only = set(baseline) ^ set(candidate)
+    if only:
+        print(f"\n({len(only)} combination(s) only present in one result set were skipped)")
+    if regressions:
+        print(f"\n❌ {regressions} significant regression(s)")
+        return 1
+    print("\n✅ No significant regressions")
+    return 0
+
+# Modes whose TTFT and tok/s are a single request on an otherwise idle server
+REPORT_LATENCY_MODES = ("standard", "context_sweep", "fleet", "probe")
+REPORT_TREND_MODES = ("standard", "fleet", "probe")
+REPORT_CSV_COLUMNS = [c for c in RUN_COLUMNS if c not in ("host", "extra", "outlier")]
+CHART_COLORS = ["#1f77b4", "#ff7f0e", "#2ca02c", "#d62728", "#9467bd", "#8c564b", "#e377c2", "#7f7f7f",
+                "#bcbd22", "#17becf"]
+
+def format_chart_value(value):
+    return f"{value:.0f}" if value >= 100 else f"{value:.3g}"
+
+def svg_chart(title, series, x_label, y_label, log_x=False, x_format=str):
+    # Self-contained inline SVG line chart, one line per series
+    points = [(x, y) for values in series.values() for x, y in values]
+    if not points:
+        return f"<h2>{html.escape(title)}</h2><p>No data.</p>"
+    width, height, left, bottom, top, right = 760, 340, 70, 50, 20, 180
+    scale_x = math.log2 if log_x else float
+    xs = [scale_x(x) for x, _ in points]
+    x_min, x_max = min(xs), max(xs)
+    y_max = max(y for _, y in points) * 1.1 or 1
+    
+    def px(x):
+        return left + (scale_x(x) - x_min) / ((x_max - x_min) or 1) * (width - left - right)
+    
+    def py(y):
+        return height - bottom - y / y_max * (height - top - bottom)
+    
+    out = [f'<h2>{html.escape(title)}</h2>',
+           f'<svg width="{width}" height="{height}" xmlns="http://www.w3.org/2000/svg" font-size="11">',
+           f'<line x1="{left}" y1="{height - bottom}" x2="{width - right}" y2="{height - bottom}" stroke="#333"/>',
+           f'<line x1="{left}" y1="{top}" x2="{left}" y2="{height - bottom}" stroke="#333"/>']
+    for i in range(5):
+        y = y_max * i / 4
+        out.append(f'<text x="{left - 6}" y="{py(y) + 4:.1f}" text-anchor="end">{format_chart_value(y)}</text>')
+        out.append(f'<line x1="{left}" y1="{py(y):.1f}" x2="{width - right}" y2="{py(y):.1f}" stroke="#eee"/>')
+    distinct = sorted({x for x, _ in points})
+    ticks = distinct if len(distinct) <= 8 else [distinct[round(i * (len(distinct) - 1) / 5)] for i in range(6)]
+    for x in ticks:
+        out.append(f'<text x="{px(x):.1f}" y="{height - bottom + 16}" text-anchor="middle">'
+                   f'{html.escape(x_format(x))}</text>')
+    out.append(f'<text x="{(left + width - right) / 2}" y="{height - 10}" text-anchor="middle">{html.escape(x_label)}</text>')
+    out.append(f'<text x="14" y="{(top + height - bottom) / 2}" text-anchor="middle" '
+               f'transform="rotate(-90 14 {(top + height - bottom) / 2})">{html.escape(y_label)}</text>')
+    for i, (name, values) in enumerate(sorted(series.items())):
+        color = CHART_COLORS[i % len(CHART_COLORS)]
+        values = sorted(values)
+        path = " ".join(f"{px(x):.1f},{py(y):.1f}" for x, y in values)
+        out.append(f'<polyline points="{path}" fill="none" stroke="{color}" stroke-width="2"/>')
+        out.extend(f'<circle cx="{px(x):.1f}" cy="{py(y):.1f}" r="3" fill="{color}"><title>'
+                   f'{html.escape(name)}: {html.escape(x_format(x))} → {format_chart_value(y)}</title></circle>' for x, y in values)
+        out.append(f'<text x="{width - right + 10}" y="{top + 14 * i + 10}" fill="{color}">{html.escape(name[:28])}</text>')
+    out.append("</svg>")
+    return "\n".join(out)
+
+def report_labels(targets):
+    # (backend, url, model) -> "backend/model", with the server added when one backend/model runs on several
+    urls = {}
+    for backend, url, model in targets:
+        urls.setdefault((backend, model), set()).add(url)
+    labels = {}
+    for backend, url, model in targets:
+        labels[(backend, url, model)] = f"{backend}/{model}"
+        if len(urls[(backend, model)]) > 1:
+            labels[(backend, url, model)] = f"{backend}@{urlsplit(url or '').netloc or url}/{model}"
+    return labels
+
+def report_models_table(models, labels):
+    rows = ["<h2>Models</h2>", "<table><tr><th>Backend/model</th><th>Runs</th><th>Errors</th><th>Avg tok/s</th>"
+            "<th>Avg TTFT</th><th>Avg decode tok/s</th><th>First</th><th>Last</th></tr>"]
+    for target, m in sorted(models.items(), key=lambda item: -(item[1]["tps"] / (item[1]["tps_n"] or 1))):
+        avg = lambda key: m[key] / m[f"{key}_n"] if m[f"{key}_n"] else None
+        rows.append(f"<tr><td>{html.escape(labels[target])}</td><td>{m['runs']}</td><td>{m['errors']}</td>"
+                    f"<td>{format_optional(avg('tps'), '.2f')}</td>"
+                    f"<td>{format_optional(avg('ttft'), '.0f', 1000)} ms</td>"
+                    f"<td>{format_optional(avg('decode_tps'), '.2f')}</td>"
+                    f"<td>{m['first'][:16]}</td><td>{m['last'][:16]}</td></tr>")
+    rows.append("</table>")
+    return "\n".join(rows)
+
+def generate_report(args):
+    if not RESULTS_DB.exists():
+        print(f"❌ No results database at {RESULTS_DB}")
+        return 1
+    db = open_results_db()
+    where, values = build_run_filter(args)
+    where = f"{where} AND {NOT_OUTLIER_SQL}" if where else f"WHERE {NOT_OUTLIER_SQL}"
+    output = Path(args.output) if args.output else TEMP_DIR / "report"
+    output.mkdir(parents=True, exist_ok=True)
+    
+    # One pass over the cursor: rows go straight to the CSV and only small aggregates stay in memory
+    models = {}
+    load_groups = {}
+    ttft_points = {}
+    trend = {}
+    runs = 0
+    with open(output / "report.csv", "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(REPORT_CSV_COLUMNS)
+        cursor = db.execute(f"SELECT {', '.join(REPORT_CSV_COLUMNS)} FROM runs {where} ORDER BY timestamp", values)
+        for row in cursor:
+            runs += 1
+            writer.writerow([row[c] for c in REPORT_CSV_COLUMNS])
+            # The same model behind different backends or servers is a different measurement
+            target = (row["backend"], row["url"], row["model"])
+            m = models.setdefault(target, {"runs": 0, "errors": 0, "first": row["timestamp"], "last": "",
+                                          "tps": 0, "tps_n": 0, "ttft": 0, "ttft_n": 0,
+                                          "decode_tps": 0, "decode_tps_n": 0})
+            m["runs"] += 1
+            m["last"] = row["timestamp"]
+            if row["error"]:
+                m["errors"] += 1
+                continue
+            for key in ("tps", "ttft", "decode_tps"):
+                if row[key] is not None:
+                    m[key] += row[key]
+                    m[f"{key}_n"] += 1
+            
+            if row["mode"] == "load" and row["tokens"] is not None:
+                # Aggregate tok/s of a level = its tokens over the span from first start to last finish
+                end = datetime.fromisoformat(row["timestamp"]).timestamp()
+                key = (target, row["session"], row["prompt_file"], row["concurrency"], row["params"], row["variant"])
+                group = load_groups.setdefault(key, [0, end - (row["latency"] or row["elapsed"] or 0), end])
+                group[0] += row["tokens"]
+                group[1] = min(group[1], end - (row["latency"] or row["elapsed"] or 0))
+                group[2] = max(group[2], end)
+            if row["mode"] in REPORT_LATENCY_MODES and row["ttft"] is not None and row["prompt_tokens"]:
+                bucket = 2 ** round(math.log2(row["prompt_tokens"]))
+                ttft_points.setdefault((target, bucket), []).append(row["ttft"])
+            if row["mode"] in REPORT_TREND_MODES and row["tps"] is not None:
+                day = row["timestamp"][:10]
+                total = trend.setdefault((target, day), [0, 0])
+                total[0] += row["tps"]
+                total[1] += 1
+    
+    if not runs:
+        print("❌ No runs match the filter")
+        return 1
+    
+    labels = report_labels(models)
+    levels = {}
+    for (target, _, _, concurrency, _, _), (tokens, start, end) in load_groups.items():
+        if end > start:
+            levels.setdefault((target, concurrency), []).append(tokens / (end - start))
+    throughput = {}
+    for (target, concurrency), rates in levels.items():
+        throughput.setdefault(labels[target], []).append((concurrency, statistics.mean(rates)))
+    ttft_series = {}
+    for (target, bucket), ttfts in ttft_points.items():
+        ttft_series.setdefault(labels[target], []).append((bucket, statistics.median(ttfts)))
+    trend_series = {}
+    for (target, day), (total, count) in trend.items():
+        trend_series.setdefault(labels[target], []).append((datetime.fromisoformat(day).toordinal(), total / count))
+    
+    generated = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    page = [
+        "<!DOCTYPE html>", '<html><head><meta charset="utf-8"><title>LLM Benchmark Report</title>',
+        "<style>body{font-family:sans-serif;margin:2em;color:#222}table{border-collapse:collapse}"
+        "td,th{border:1px solid #ccc;padding:4px 8px;text-align:right}td:first-child{text-align:left}</style>",
+        "</head><body>",
+        f"<h1>LLM Benchmark Report</h1><p>{runs} runs, {len(models)} backend/model pairs, generated {generated}</p>",
+        report_models_table(models, labels),
+        svg_chart("Throughput vs concurrency (load tests)", throughput, "concurrent requests",
+                  "aggregate tok/s", log_x=True, x_format=lambda x: str(x)),
+        svg_chart("TTFT vs context length", ttft_series, "prompt tokens", "median TTFT (s)", log_x=True,
+                  x_format=lambda x: str(x)),
+        svg_chart("Throughput over time", trend_series, "day", "mean tok/s",
+                  x_format=lambda x: datetime.fromordinal(int(x)).strftime("%Y-%m-%d")),
+        "</body></html>",
+    ]
+    (output / "report.html").write_text("\n".join(page), encoding="utf-8")
+    print(f"📊 {runs} runs, {len(models)} backend/model pairs")
+    print(f"💾 Report saved to: {output / 'report.html'} (CSV: {output / 'report.csv'})")
+    return 0
+
 def menu_select(title, options, multi_select=False):
     selected = 0
     marked = set() if multi_select else None
     
     while True:
-        os.system('clear' if os.name != 'nt' else 'cls')
+        clear_screen()
         print(f"╔{'═' * 50}╗")
         print(f"║ {title:<48} ║")
         print(f"╚{'═' * 50}╝\n")
@@ -140,131 +976,1768 @@ def menu_select(title, options, multi_select=False):
             else:
                 marked.add(selected)
 
-def get_ollama_models(url, custom_models=None):
-    try:
-        r = requests.get(f"{url}/api/tags", timeout=2)
-        models = [m["name"] for m in r.json()["models"]]
-    except:
-        models = []
+def get_ollama_models(url, custom_models=None):
+    try:
+        r = http_session(url).get(f"{url}/api/tags", timeout=2)
+        models = [m["name"] for m in r.json()["models"]]
+    except:
+        models = []
+    
+    # Add custom models for this backend
+    if custom_models:
+        models.extend(custom_models)
+    
+    return models
+
+def get_openai_models(url, custom_models=None):
+    try:
+        r = http_session(url).get(f"{url}/v1/models", timeout=2)
+        models = [m["id"] for m in r.json()["data"]]
+    except:
+        models = []
+    
+    # Add custom models for this backend
+    if custom_models:
+        models.extend(custom_models)
+    
+    return models
+
+def percentile(values, pct):
+    if not values:
+        return 0
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * pct / 100
+    lo = int(k)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+def build_metrics(elapsed, tokens, prompt_tokens=None, ttft=None, arrivals=None,
+                  prefill_time=None, decode_time=None):
+    # arrivals: perf_counter timestamps of each streamed token chunk
+    itl = [b - a for a, b in zip(arrivals, arrivals[1:])] if arrivals else []
+    if decode_time is None and arrivals and len(arrivals) > 1:
+        decode_time = arrivals[-1] - arrivals[0]
+        # First token belongs to prefill, the rest is pure decode
+        decode_tokens = tokens - 1
+    else:
+        decode_tokens = tokens
+    if prefill_time is None:
+        prefill_time = ttft
+    return {
+        "elapsed": elapsed,
+        "tokens": tokens,
+        "tps": tokens / elapsed if elapsed > 0 else 0,
+        "prompt_tokens": prompt_tokens,
+        "ttft": ttft,
+        "prefill_tps": prompt_tokens / prefill_time if prompt_tokens and prefill_time else None,
+        "decode_tps": decode_tokens / decode_time if decode_time and decode_tokens > 0 else None,
+        "itl": itl,
+    }
+
+def ollama_server_durations(data):
+    # Ollama reports nanoseconds; keep seconds so they line up with client timings
+    durations = {}
+    for key, name in (("load_duration", "load"), ("prompt_eval_duration", "prompt_eval"),
+                      ("eval_duration", "eval"), ("total_duration", "total")):
+        if data.get(key) is not None:
+            durations[name] = data[key] / 1e9
+    return durations
+
+def llamacpp_server_durations(timings):
+    durations = {}
+    if timings.get("prompt_ms") is not None:
+        durations["prompt_eval"] = timings["prompt_ms"] / 1000
+    if timings.get("predicted_ms") is not None:
+        durations["eval"] = timings["predicted_ms"] / 1000
+    return durations
+
+def merge_payload(payload, extra):
+    # Nested dicts such as Ollama "options" are merged instead of replaced
+    for key, value in (extra or {}).items():
+        if isinstance(value, dict) and isinstance(payload.get(key), dict):
+            payload[key] = {**payload[key], **value}
+        else:
+            payload[key] = value
+    return payload
+
+def test_ollama(url, model, prompt, config, extra=None):
+    stream = config.get("streaming", False)
+    options = {
+        "temperature": config["temperature"],
+        "num_predict": config["max_tokens"],
+        "top_p": config["top_p"],
+        "repeat_penalty": config["repeat_penalty"],
+    }
+    payload = merge_payload({"model": model, "prompt": prompt, "stream": stream, "options": options}, extra)
+    # Wall-clock send time, so replays can reproduce the original arrival pattern
+    sent_at = datetime.now().isoformat(timespec="milliseconds")
+    reset_connect_time()
+    start = time.perf_counter()
+    r = http_session(url).post(f"{url}/api/generate", json=payload, stream=stream, timeout=request_timeout())
+    r.raise_for_status()
+    # A fresh connection's handshake is reported on its own, not as server time
+    connect_time = take_connect_time()
+    start += connect_time
+    
+    if not stream:
+        data = r.json()
+        elapsed = time.perf_counter() - start
+        tokens = data.get("eval_count", 0)
+        # Server-side durations are in nanoseconds
+        metrics = build_metrics(
+            elapsed, tokens,
+            prompt_tokens=data.get("prompt_eval_count"),
+            prefill_time=data.get("prompt_eval_duration", 0) / 1e9 or None,
+            decode_time=data.get("eval_duration", 0) / 1e9 or None,
+        )
+        metrics["server"] = ollama_server_durations(data)
+        metrics["connect_time"] = connect_time
+        metrics["sent_at"] = sent_at
+        return metrics, payload, data
+    
+    # NDJSON stream: one JSON object per line, last one has done=true and the counters
+    arrivals = []
+    text, thinking = [], []
+    data = {}
+    for line in r.iter_lines():
+        if not line:
+            continue
+        chunk = json.loads(line)
+        if chunk.get("response") or chunk.get("thinking"):
+            arrivals.append(time.perf_counter())
+            text.append(chunk.get("response", ""))
+            thinking.append(chunk.get("thinking", ""))
+        if chunk.get("done"):
+            data = chunk
+    elapsed = time.perf_counter() - start
+    
+    data["response"] = "".join(text)
+    if any(thinking):
+        data["thinking"] = "".join(thinking)
+    tokens = data.get("eval_count", len(arrivals))
+    ttft = arrivals[0] - start if arrivals else None
+    metrics = build_metrics(elapsed, tokens, prompt_tokens=data.get("prompt_eval_count"),
+                            ttft=ttft, arrivals=arrivals)
+    metrics["server"] = ollama_server_durations(data)
+    metrics["connect_time"] = connect_time
+    metrics["sent_at"] = sent_at
+    return metrics, payload, data
+
+def test_openai(url, model, prompt, config, extra=None):
+    stream = config.get("streaming", False)
+    payload = {
+        "model": model,
+        "messages": [{"role": "user", "content": prompt}],
+        "stream": stream,
+        "temperature": config["temperature"],
+        "max_tokens": config["max_tokens"],
+        "top_p": config["top_p"],
+        "repeat_penalty": config["repeat_penalty"]
+    }
+    if stream:
+        payload["stream_options"] = {"include_usage": True}
+    merge_payload(payload, extra)
+    # Wall-clock send time, so replays can reproduce the original arrival pattern
+    sent_at = datetime.now().isoformat(timespec="milliseconds")
+    reset_connect_time()
+    start = time.perf_counter()
+    r = http_session(url).post(f"{url}/v1/chat/completions", json=payload, stream=stream,
+                               timeout=request_timeout())
+    r.raise_for_status()
+    # A fresh connection's handshake is reported on its own, not as server time
+    connect_time = take_connect_time()
+    start += connect_time
+    
+    if not stream:
+        data = r.json()
+        elapsed = time.perf_counter() - start
+        usage = data.get("usage", {})
+        tokens = usage.get("completion_tokens", 0)
+        # llama.cpp reports its own prefill/decode timings (milliseconds)
+        timings = data.get("timings", {})
+        metrics = build_metrics(
+            elapsed, tokens,
+            prompt_tokens=usage.get("prompt_tokens"),
+            prefill_time=timings.get("prompt_ms", 0) / 1000 or None,
+            decode_time=timings.get("predicted_ms", 0) / 1000 or None,
+        )
+        metrics["server"] = llamacpp_server_durations(timings)
+        metrics["connect_time"] = connect_time
+        metrics["sent_at"] = sent_at
+        return metrics, payload, data
+    
+    # SSE stream: "data: {...}" lines terminated by "data: [DONE]"
+    arrivals = []
+    text, thinking = [], []
+    usage, timings, finish_reason = {}, {}, None
+    for line in r.iter_lines():
+        if not line:
+            continue
+        line = line.decode("utf-8")
+        if not line.startswith("data:"):
+            continue
+        body = line[5:].strip()
+        if body == "[DONE]":
+            # Keep reading to the end of the body so the connection goes back to the pool
+            continue
+        chunk = json.loads(body)
+        usage = chunk.get("usage") or usage
+        timings = chunk.get("timings") or timings
+        for choice in chunk.get("choices", []):
+            delta = choice.get("delta", {})
+            reasoning = delta.get("reasoning_content") or delta.get("thinking")
+            if delta.get("content") or reasoning:
+                arrivals.append(time.perf_counter())
+                text.append(delta.get("content") or "")
+                thinking.append(reasoning or "")
+            finish_reason = choice.get("finish_reason") or finish_reason
+    elapsed = time.perf_counter() - start
+    
+    # Rebuild a non-streaming shaped response so artifacts look the same
+    message = {"role": "assistant", "content": "".join(text)}
+    if any(thinking):
+        message["reasoning_content"] = "".join(thinking)
+    data = {"choices": [{"message": message, "finish_reason": finish_reason}], "usage": usage}
+    if timings:
+        data["timings"] = timings
+    tokens = usage.get("completion_tokens", len(arrivals))
+    ttft = arrivals[0] - start if arrivals else None
+    metrics = build_metrics(elapsed, tokens, prompt_tokens=usage.get("prompt_tokens"),
+                            ttft=ttft, arrivals=arrivals)
+    metrics["server"] = llamacpp_server_durations(timings)
+    metrics["connect_time"] = connect_time
+    metrics["sent_at"] = sent_at
+    return metrics, payload, data
+
+def get_test_fn(backend, config):
+    if backend == "ollama":
+        test_fn = lambda u, m, p, extra=None: test_ollama(u, m, p, config, extra)
+    else:
+        test_fn = lambda u, m, p, extra=None: test_openai(u, m, p, config, extra)
+    if _dashboard is not None:
+        return _dashboard.track(test_fn)
+    return test_fn
+
+def format_metrics(metrics):
+    line = f"{metrics['tps']:.2f} tok/s ({metrics['tokens']} tokens in {metrics['elapsed']:.2f}s)"
+    extra = []
+    if metrics.get("ttft") is not None:
+        extra.append(f"TTFT {metrics['ttft'] * 1000:.0f}ms")
+    if metrics.get("prefill_tps"):
+        extra.append(f"prefill {metrics['prefill_tps']:.1f} tok/s")
+    if metrics.get("decode_tps"):
+        extra.append(f"decode {metrics['decode_tps']:.1f} tok/s")
+    if metrics.get("connect_time"):
+        extra.append(f"connect {metrics['connect_time'] * 1000:.1f}ms (excluded)")
+    if metrics.get("itl"):
+        extra.append(f"ITL p50 {percentile(metrics['itl'], 50) * 1000:.1f}ms"
+                     f" p95 {percentile(metrics['itl'], 95) * 1000:.1f}ms")
+    if extra:
+        line += " | " + ", ".join(extra)
+    return line
+
+def average_metric(results, key):
+    values = [r[key] for r in results if r.get(key) is not None]
+    return sum(values) / len(values) if values else None
+
+ARTIFACT_MODES = ["jsonl", "files", "metrics"]
+
+_artifact_config = {}
+_artifact_writer = None
+_artifact_lock = threading.Lock()
+
+def prompt_digest(prompt):
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+def store_prompt(prompt):
+    # Prompts are kept once per content, however many runs and sessions use them
+    digest = prompt_digest(prompt)
+    path = PROMPT_STORE_DIR / f"{digest}.txt.gz"
+    if not path.exists():
+        PROMPT_STORE_DIR.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        with gzip.open(tmp, "wt", encoding="utf-8") as f:
+            f.write(prompt)
+        tmp.replace(path)
+    return digest
+
+def load_stored_prompt(digest):
+    with gzip.open(PROMPT_STORE_DIR / f"{digest}.txt.gz", "rt", encoding="utf-8") as f:
+        return f.read()
+
+def strip_prompt(payload, prompt):
+    # The prompt text lives in the prompt store; the payload only keeps the other fields
+    payload = dict(payload)
+    if payload.get("prompt") == prompt:
+        del payload["prompt"]
+    if payload.get("messages"):
+        payload["messages"] = [{**m, "content": None} if m.get("content") == prompt else m
+                               for m in payload["messages"]]
+    return payload
+
+def iter_artifacts(path, with_prompts=False):
+    # Streams records from every artifacts.jsonl.gz under path without loading whole files
+    path = Path(path)
+    files = [path] if path.is_file() else sorted(path.rglob(ARTIFACTS_FILE))
+    prompts = {}
+    for artifact_file in files:
+        try:
+            with gzip.open(artifact_file, "rt", encoding="utf-8") as f:
+                for line in f:
+                    record = json.loads(line)
+                    if with_prompts:
+                        digest = record["prompt_sha256"]
+                        if digest not in prompts:
+                            prompts[digest] = load_stored_prompt(digest)
+                        record["prompt"] = prompts[digest]
+                    yield record
+        except EOFError:
+            # Writer was killed mid-session; everything before the last flush is still readable
+            continue
+
+class ArtifactWriter:
+    # A single background thread does all serialization, compression and disk I/O,
+    # so benchmark threads only pay for a queue put
+    def __init__(self):
+        self.queue = queue.Queue()
+        self.handles = {}
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+    
+    def run(self):
+        while True:
+            item = self.queue.get()
+            try:
+                if item is None:
+                    self.close()
+                elif item["mode"] == "files":
+                    write_artifact_files(**{k: v for k, v in item.items() if k != "mode"})
+                else:
+                    self.append(item)
+            except Exception as e:
+                print(f"  ⚠️  Could not save artifacts: {e}")
+            finally:
+                self.queue.task_done()
+    
+    def append(self, item):
+        record = {
+            "backend": item["backend"],
+            "model": item["model"],
+            "prompt_file": item["prompt_file"],
+            "timestamp": item["timestamp"],
+            "sent_at": item["sent_at"],
+            "run": item["run_num"],
+            "prompt_sha256": store_prompt(item["prompt"]),
+            "payload": strip_prompt(item["payload"], item["prompt"]),
+            "response": item["response"],
+        }
+        session_dir = item["session_dir"]
+        handle = self.handles.get(session_dir)
+        if handle is None:
+            session_dir.mkdir(parents=True, exist_ok=True)
+            # Appending starts a new gzip member, which readers see as one stream
+            handle = self.handles[session_dir] = gzip.open(session_dir / ARTIFACTS_FILE, "at", encoding="utf-8")
+        handle.write(json.dumps(record, ensure_ascii=False) + "\n")
+    
+    def close(self):
+        for handle in self.handles.values():
+            handle.close()
+        self.handles.clear()
+    
+    def flush(self):
+        self.queue.put(None)
+        self.queue.join()
+
+def configure_artifacts(config):
+    _artifact_config["mode"] = config.get("artifacts", "jsonl")
+
+def flush_artifacts():
+    # Waits until everything queued so far is on disk
+    if _artifact_writer is not None:
+        _artifact_writer.flush()
+
+def save_request_response(backend, model, prompt_file, prompt, payload, response, run_num, session_dir,
+                          sent_at=None):
+    global _artifact_writer
+    mode = _artifact_config.get("mode", "jsonl")
+    if mode == "metrics":
+        return
+    with _artifact_lock:
+        if _artifact_writer is None:
+            _artifact_writer = ArtifactWriter()
+            atexit.register(flush_artifacts)
+    _artifact_writer.queue.put({
+        "mode": mode,
+        "backend": backend,
+        "model": model,
+        "prompt_file": prompt_file,
+        "prompt": prompt,
+        "payload": payload,
+        "response": response,
+        "run_num": run_num,
+        "session_dir": session_dir,
+        "timestamp": datetime.now().strftime("%Y%m%d_%H%M%S_%f")[:-3],
+        "sent_at": sent_at,
+    })
+
+def write_artifact_files(backend, model, prompt_file, prompt, payload, response, run_num, session_dir, timestamp,
+                         sent_at=None):
+    session_dir.mkdir(parents=True, exist_ok=True)
+    prompt_name = Path(prompt_file).stem
+    model_safe = model.replace("/", "_").replace(":", "_")
+    
+    base_name = f"{timestamp}_{backend}_{model_safe}_{prompt_name}_run{run_num}"
+    
+    # Request file
+    request_data = {
+        "backend": backend,
+        "model": model,
+        "prompt_file": prompt_file,
+        "timestamp": timestamp,
+        "sent_at": sent_at,
+        "run": run_num,
+        "payload": payload,
+        "prompt": prompt
+    }
+    (session_dir / f"{base_name}.req").write_text(json.dumps(request_data, indent=2, ensure_ascii=False))
+    
+    # Response file - JSON format
+    (session_dir / f"{base_name}.res.json").write_text(json.dumps(response, indent=2, ensure_ascii=False))
+    
+    # Response file - Formatted markdown
+    try:
+        if backend == "ollama":
+            content = response.get("response", "")
+        else:
+            # OpenAI format - check for thinking/reasoning
+            message = response.get("choices", [{}])[0].get("message", {})
+            content = message.get("content", "")
+            
+            # Check if there's a thinking/reasoning process
+            thinking = None
+            if "reasoning_content" in message:
+                thinking = message.get("reasoning_content")
+            elif "thinking" in message:
+                thinking = message.get("thinking")
+            
+            # Format with thinking section if exists
+            if thinking:
+                formatted_content = f"## 🧠 Düşünme Süreci\n\n```\n{thinking}\n```\n\n---\n\n## 💬 Cevap\n\n{content}"
+            else:
+                formatted_content = content
+        
+        (session_dir / f"{base_name}.res.md").write_text(formatted_content if backend != "ollama" else content, encoding='utf-8')
+    except:
+        pass
+
+# Two-sided 95% Student t critical values for df = 1..30
+T_CRITICAL_95 = [
+    12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+    2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+    2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042,
+]
+
+def ci_half_width_pct(values):
+    # 95% confidence interval half-width relative to the mean, in percent
+    if len(values) < 2:
+        return None
+    mean = statistics.mean(values)
+    if not mean:
+        return None
+    t = T_CRITICAL_95[len(values) - 2] if len(values) - 1 <= len(T_CRITICAL_95) else 1.96
+    return t * statistics.stdev(values) / len(values) ** 0.5 / mean * 100
+
+def find_outliers(values):
+    # Tukey fences; needs a handful of samples to say anything meaningful
+    if len(values) < 4:
+        return set()
+    q1, q3 = percentile(values, 25), percentile(values, 75)
+    low, high = q1 - 1.5 * (q3 - q1), q3 + 1.5 * (q3 - q1)
+    return {i for i, v in enumerate(values) if v < low or v > high}
+
+LOCAL_HOSTS = ("localhost", "127.0.0.1", "::1", "0.0.0.0")
+
+def read_proc_process(pid):
+    # utime+stime in clock ticks, major faults, RSS bytes and thread count of one process
+    with open(f"/proc/{pid}/stat") as f:
+        # comm may contain spaces, the fixed fields start after its closing parenthesis
+        fields = f.read().rsplit(")", 1)[1].split()
+    rss = threads = 0
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                rss = int(line.split()[1]) * 1024
+            elif line.startswith("Threads:"):
+                threads = int(line.split()[1])
+    return {"ticks": int(fields[11]) + int(fields[12]), "majflt": int(fields[9]), "rss": rss, "threads": threads}
+
+def read_proc_system():
+    system = {}
+    with open("/proc/meminfo") as f:
+        for line in f:
+            key, value = line.split(":", 1)
+            if key in ("MemTotal", "MemAvailable"):
+                system[key] = int(value.split()[0]) * 1024
+    try:
+        # "some avg10=0.00 ..." - share of time any task stalled on memory in the last 10s
+        with open("/proc/pressure/memory") as f:
+            system["psi_some"] = float(f.readline().split()[1].split("=")[1])
+    except (OSError, IndexError, ValueError):
+        system["psi_some"] = None
+    return system
+
+def find_inference_pids(names):
+    pids = []
+    for entry in os.scandir("/proc"):
+        if not entry.name.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry.name}/comm") as f:
+                comm = f.read().strip()
+        except OSError:
+            continue
+        if comm in names:
+            pids.append(int(entry.name))
+    return pids
+
+class ResourceSampler:
+    # Polls /proc for the local inference server's processes while a benchmark runs.
+    # Ollama spawns runner processes on model load, so the process list is refreshed on every sample.
+    def __init__(self, names, interval):
+        self.names = set(names)
+        self.interval = interval
+        self.clock_ticks = os.sysconf("SC_CLK_TCK")
+        self.samples = []
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+    
+    @classmethod
+    def for_backend(cls, url, config):
+        # Only a server on this machine can be observed, and only where /proc exists
+        if not config.get("resource_sampling", True) or not Path("/proc/meminfo").exists():
+            return None
+        if urlsplit(url).hostname not in LOCAL_HOSTS:
+            return None
+        sampler = cls(config["resource_processes"], config["resource_sample_interval"])
+        if not find_inference_pids(sampler.names):
+            return None
+        return sampler
+    
+    def sample(self):
+        processes = {}
+        for pid in find_inference_pids(self.names):
+            try:
+                processes[pid] = read_proc_process(pid)
+            except (OSError, IndexError, ValueError):
+                continue
+        sample = {"t": time.perf_counter(), "processes": processes, **read_proc_system()}
+        with self.lock:
+            self.samples.append(sample)
+        return sample
+    
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            self.sample()
+    
+    def __enter__(self):
+        self.sample()
+        self.thread.start()
+        return self
+    
+    def __exit__(self, *exc):
+        self.stop_event.set()
+        self.thread.join()
+    
+    def cpu_between(self, a, b):
+        # Cores in use between two samples; a pid that came or went only counts while it was in both
+        ticks = sum(p["ticks"] - a["processes"][pid]["ticks"]
+                    for pid, p in b["processes"].items() if pid in a["processes"])
+        return ticks / self.clock_ticks / (b["t"] - a["t"]) if b["t"] > a["t"] else 0
+    
+    def window(self, start):
+        # Called right after a request finished; the fresh sample closes the window
+        end = self.sample()
+        with self.lock:
+            before = [s for s in self.samples if s["t"] <= start]
+            inside = [s for s in self.samples if start < s["t"] <= end["t"]]
+            # Runs are sequential, nothing older than this window is needed again
+            self.samples = [end]
+        if not before:
+            return None
+        points = [before[-1]] + inside
+        series = []
+        for prev, cur in zip(points, points[1:]):
+            series.append({
+                "t": round(cur["t"] - start, 3),
+                "cpu": round(self.cpu_between(prev, cur), 2),
+                "rss_mb": round(sum(p["rss"] for p in cur["processes"].values()) / 2**20, 1),
+                "threads": sum(p["threads"] for p in cur["processes"].values()),
+                "mem_available_mb": round(cur["MemAvailable"] / 2**20, 1),
+                "psi_some": cur["psi_some"],
+            })
+        first = points[0]
+        rss_gb = max(sum(p["rss"] for p in s["processes"].values()) for s in points[1:]) / 2**30
+        return {
+            "cpu_cores": self.cpu_between(first, end),
+            "rss_gb": rss_gb,
+            "threads": max(s["threads"] for s in series),
+            "mem_used_pct": (1 - min(s["MemAvailable"] for s in points[1:]) / end["MemTotal"]) * 100,
+            "psi_some": max((s["psi_some"] for s in series if s["psi_some"] is not None), default=None),
+            "major_faults": sum(p["majflt"] - first["processes"][pid]["majflt"]
+                                for pid, p in end["processes"].items() if pid in first["processes"]),
+            "series": series,
+        }
+
+def resource_efficiency(metrics):
+    # tok/s per busy core and per GB resident; decode rate x resident size roughly tracks
+    # the weight bytes read per second, which is what bounds decoding on CPU-only hosts
+    resources = metrics.get("resources")
+    if not resources:
+        return {}
+    rate = metrics.get("decode_tps") or metrics["tps"]
+    return {
+        "tps_per_core": metrics["tps"] / resources["cpu_cores"] if resources["cpu_cores"] else None,
+        "tps_per_gb": metrics["tps"] / resources["rss_gb"] if resources["rss_gb"] else None,
+        "weight_read_gbps": rate * resources["rss_gb"],
+    }
+
+def format_resources(metrics):
+    resources = metrics["resources"]
+    efficiency = resource_efficiency(metrics)
+    line = (f"CPU {resources['cpu_cores']:.1f} cores, RSS {resources['rss_gb']:.2f}GB, "
+            f"{resources['threads']} threads, mem {resources['mem_used_pct']:.0f}% used")
+    if resources["psi_some"]:
+        line += f", PSI {resources['psi_some']:.1f}%"
+    if resources["major_faults"]:
+        line += f", {resources['major_faults']} major faults"
+    if efficiency["tps_per_core"]:
+        line += f" | {efficiency['tps_per_core']:.2f} tok/s/core"
+    if efficiency["tps_per_gb"]:
+        line += f", {efficiency['tps_per_gb']:.2f} tok/s/GB, ~{efficiency['weight_read_gbps']:.1f} GB/s weight reads"
+    return line
+
+def summarize_resources(results):
+    sampled = [r for r in results if r.get("resources")]
+    if not sampled:
+        return {}
+    efficiency = [resource_efficiency(r) for r in sampled]
+    return {
+        "cpu_cores": statistics.mean(r["resources"]["cpu_cores"] for r in sampled),
+        "rss_gb": statistics.mean(r["resources"]["rss_gb"] for r in sampled),
+        "tps_per_core": average_metric(efficiency, "tps_per_core"),
+        "tps_per_gb": average_metric(efficiency, "tps_per_gb"),
+        "weight_read_gbps": average_metric(efficiency, "weight_read_gbps"),
+    }
+
+def stability_metric(metrics):
+    return metrics["decode_tps"] if metrics.get("decode_tps") else metrics["tps"]
+
+def run_benchmark(backend, url, model, prompt, prompt_file, iterations, session_dir, config, extra=None,
+                  mode="standard"):
+    adaptive = config.get("adaptive_iterations", False)
+    warmup_runs = config.get("warmup_runs", 0)
+    print(f"\n🔄 Testing {model}...")
+    print(f"📝 Prompt: {prompt[:60]}..." if len(prompt) > 60 else f"📝 Prompt: {prompt}")
+    if adaptive:
+        print(f"🔁 Iterations: {iterations}+ (adaptive, until ±{config['target_ci_pct']}% CI, "
+              f"max {config['max_runs']} runs / {config['max_time']}s)")
+    else:
+        print(f"🔁 Iterations: {iterations}")
+    print(f"📡 Streaming: {'on' if config.get('streaming') else 'off'}\n")
+    results = []
+    
+    test_fn = get_test_fn(backend, config)
+    
+    # Warm-up runs load the model and fill caches; their timings are thrown away
+    for i in range(warmup_runs):
+        try:
+            metrics, _, _ = test_fn(url, model, prompt, extra)
+            print(f"  Warm-up {i+1}: {format_metrics(metrics)} (discarded)")
+        except Exception as e:
+            print(f"  Warm-up {i+1}: ❌ Error - {e}")
+    
+    sampler = ResourceSampler.for_backend(url, config)
+    if sampler:
+        print(f"📈 Sampling {', '.join(sorted(sampler.names))} every {sampler.interval}s\n")
+    started = time.perf_counter()
+    attempts = 0
+    ci_pct = None
+    with sampler or nullcontext():
+        while True:
+            if attempts >= iterations:
+                if not adaptive:
+                    break
+                ci_pct = ci_half_width_pct([stability_metric(r) for r in results])
+                if ci_pct is not None and ci_pct <= config["target_ci_pct"]:
+                    break
+                if attempts >= config["max_runs"] or time.perf_counter() - started >= config["max_time"]:
+                    print("  ⏱️  Run budget exhausted before reaching the target CI")
+                    break
+            attempts += 1
+            try:
+                run_start = time.perf_counter()
+                metrics, payload, response = test_fn(url, model, prompt, extra)
+                if sampler:
+                    metrics["resources"] = sampler.window(run_start)
+                # Attempt number and results.db row, so rejections can be reported and stored per run
+                metrics["run"] = attempts
+                results.append(metrics)
+                save_request_response(backend, model, prompt_file, prompt, payload, response, attempts, session_dir,
+                                      sent_at=metrics["sent_at"])
+                metrics["run_id"] = record_run(mode, backend, url, model, prompt_file, attempts, session_dir,
+                                               config, metrics, extra={"request": extra} if extra else None)
+                remember_prompt_tokens(prompt_file, tokenizer_key(backend, model), metrics["prompt_tokens"])
+                print(f"  Run {attempts}: {format_metrics(metrics)}")
+                if metrics.get("resources"):
+                    print(f"         {format_resources(metrics)}")
+            except Exception as e:
+                record_run(mode, backend, url, model, prompt_file, attempts, session_dir, config, error=str(e),
+                           extra={"request": extra} if extra else None)
+                print(f"  Run {attempts}: ❌ Error - {e}")
+    
+    rejected = set()
+    if config.get("outlier_rejection", True):
+        rejected = find_outliers([stability_metric(r) for r in results])
+        for i in sorted(rejected):
+            mark_outlier(results[i]["run_id"])
+            print(f"  🚫 Run {results[i]['run']} rejected as outlier ({stability_metric(results[i]):.2f} tok/s)")
+    kept = [r for i, r in enumerate(results) if i not in rejected]
+    
+    if kept:
+        avg_tps = average_metric(kept, "tps")
+        ci_pct = ci_half_width_pct([stability_metric(r) for r in kept])
+        ci_note = f" (±{ci_pct:.1f}% CI, {len(kept)} runs)" if ci_pct is not None else ""
+        print(f"\n✅ Average: {avg_tps:.2f} tok/s{ci_note}")
+        save_result(backend, model, prompt_file, prompt, results, attempts, rejected, warmup_runs)
+        return {
+            "tps": avg_tps,
+            "runs": len(kept),
+            "rejected": len(rejected),
+            "ci_pct": ci_pct,
+            "errors": attempts - len(results),
+            "ttft": average_metric(kept, "ttft"),
+            "prefill_tps": average_metric(kept, "prefill_tps"),
+            "decode_tps": average_metric(kept, "decode_tps"),
+            "latency_p95": percentile([r["elapsed"] for r in kept], 95),
+            "output_tokens": [r["tokens"] for r in kept],
+            **summarize_resources(kept),
+        }
+    return None
+
+def run_load_level(backend, url, model, prompt, prompt_file, concurrency, total_requests, session_dir, config,
+                   extra=None):
+    test_fn = get_test_fn(backend, config)
+    
+    def timed_request():
+        start = time.perf_counter()
+        metrics, payload, response = test_fn(url, model, prompt, extra)
+        metrics["latency"] = time.perf_counter() - start
+        return metrics, payload, response
+    
+    results, errors = [], 0
+    wall_start = time.perf_counter()
+    # The pool size caps in-flight requests, the queue keeps every slot busy
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(timed_request) for _ in range(total_requests)]
+        for i, future in enumerate(as_completed(futures), 1):
+            try:
+                metrics, payload, response = future.result()
+                results.append(metrics)
+                save_request_response(backend, model, prompt_file, prompt, payload, response,
+                                      f"c{concurrency}_{i}", session_dir, sent_at=metrics["sent_at"])
+                record_run("load", backend, url, model, prompt_file, f"c{concurrency}_{i}", session_dir,
+                           config, metrics, concurrency=concurrency, extra={"request": extra} if extra else None)
+            except Exception as e:
+                errors += 1
+                record_run("load", backend, url, model, prompt_file, f"c{concurrency}_{i}", session_dir,
+                           config, error=str(e), concurrency=concurrency, extra={"request": extra} if extra else None)
+                print(f"    ❌ Request error - {e}")
+    wall = time.perf_counter() - wall_start
+    
+    latencies = [r["latency"] for r in results]
+    total_tokens = sum(r["tokens"] for r in results)
+    return {
+        "concurrency": concurrency,
+        "requests": len(results),
+        "errors": errors,
+        "wall": wall,
+        "tokens": total_tokens,
+        "tps": total_tokens / wall if wall > 0 else 0,
+        "per_request_tps": average_metric(results, "tps") or 0,
+        "ttft": average_metric(results, "ttft"),
+        "decode_tps": average_metric(results, "decode_tps"),
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+    }
+
+def format_load_level(level):
+    return (f"c={level['concurrency']:<3} | {level['tps']:>8.2f} tok/s aggregate"
+            f" | {level['per_request_tps']:>7.2f} tok/s/request"
+            f" | latency p50/p95/p99 {level['p50']:.2f}/{level['p95']:.2f}/{level['p99']:.2f}s"
+            f" | {level['requests']} ok, {level['errors']} errors")
+
+def run_load_test(backend, url, model, prompt, prompt_file, session_dir, config, extra=None):
+    levels = config["concurrency_levels"]
+    print(f"\n🔄 Load testing {model}...")
+    print(f"📝 Prompt: {prompt[:60]}..." if len(prompt) > 60 else f"📝 Prompt: {prompt}")
+    print(f"🚦 Concurrency levels: {', '.join(str(n) for n in levels)}")
+    print(f"🔁 Requests per level: {config['load_rounds']} x concurrency\n")
+    
+    report = []
+    for concurrency in levels:
+        print(f"  ⏳ {concurrency} concurrent...")
+        level = run_load_level(backend, url, model, prompt, prompt_file, concurrency,
+                               concurrency * config["load_rounds"], session_dir, config, extra=extra)
+        print(f"  {format_load_level(level)}")
+        if level["requests"]:
+            report.append(level)
+    
+    if report:
+        save_load_result(backend, model, prompt_file, prompt, report)
+    return report
+
+def save_load_result(backend, model, prompt_file, prompt, report):
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    
+    with open(RESULTS_FILE, 'a', encoding='utf-8') as f:
+        f.write("=" * 80 + "\n")
+        f.write(f"LOAD TEST REPORT - {timestamp}\n")
+        f.write("=" * 80 + "\n\n")
+        
+        f.write(f"Backend: {backend.upper()}\n")
+        f.write(f"Model: {model}\n")
+        f.write(f"Prompt File: {prompt_file}\n")
+        f.write(f"Prompt Stats: {len(prompt)} chars, ~{count_tokens(prompt)} tokens\n\n")
+        
+        f.write("THROUGHPUT CURVE:\n")
+        for level in report:
+            f.write(f"  {format_load_level(level)}\n")
+        
+        best = max(report, key=lambda x: x["tps"])
+        f.write(f"\nPEAK AGGREGATE: {best['tps']:.2f} tok/s at concurrency {best['concurrency']}\n")
+        f.write("\n\n")
+
+def run_open_loop_rate(backend, url, model, prompts, weights, rate, session_dir, config):
+    # Open loop needs TTFT for the SLO, so always stream
+    test_fn = get_test_fn(backend, {**config, "streaming": True})
+    duration = config["open_loop_duration"]
+    poisson = config["open_loop_arrival"] == "poisson"
+    results, errors = [], []
+    lock = threading.Lock()
+    
+    def timed_request(prompt_file, prompt, scheduled):
+        # Queueing inside the client counts against latency (no coordinated omission)
+        started = time.perf_counter()
+        metrics, payload, response = test_fn(url, model, prompt)
+        metrics["latency"] = time.perf_counter() - scheduled
+        metrics["ttft"] = (metrics["ttft"] or metrics["elapsed"]) + (started - scheduled)
+        return metrics, payload, response
+    
+    def on_done(future, prompt_file):
+        try:
+            metrics, payload, response = future.result()
+        except Exception as e:
+            with lock:
+                errors.append(str(e))
+            record_run("open_loop", backend, url, model, prompt_file, f"r{rate}", session_dir, config,
+                       error=str(e), extra={"rate": rate}, variant=f"rate={rate}")
+            return
+        with lock:
+            results.append(metrics)
+            run_num = f"r{rate}_{len(results)}"
+        save_request_response(backend, model, prompt_file, prompts[prompt_file],
+                              payload, response, run_num, session_dir, sent_at=metrics["sent_at"])
+        record_run("open_loop", backend, url, model, prompt_file, run_num, session_dir, config, metrics,
+                   extra={"rate": rate}, variant=f"rate={rate}")
+    
+    names = list(prompts)
+    rng = random.Random()
+    issued = 0
+    start = time.perf_counter()
+    next_arrival = start
+    with ThreadPoolExecutor(max_workers=config["open_loop_max_inflight"]) as pool:
+        # Issue on schedule regardless of how many requests are still running
+        while next_arrival - start < duration:
+            delay = next_arrival - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            prompt_file = rng.choices(names, weights=weights)[0]
+            future = pool.submit(timed_request, prompt_file, prompts[prompt_file], next_arrival)
+            future.add_done_callback(lambda f, p=prompt_file: on_done(f, p))
+            issued += 1
+            next_arrival += rng.expovariate(rate) if poisson else 1 / rate
+    wall = time.perf_counter() - start
+    
+    good = [r for r in results
+            if r["ttft"] <= config["slo_ttft"] and r["latency"] <= config["slo_latency"]]
+    latencies = [r["latency"] for r in results]
+    ttfts = [r["ttft"] for r in results]
+    return {
+        "rate": rate,
+        "issued": issued,
+        "requests": len(results),
+        "errors": len(errors),
+        "wall": wall,
+        "achieved_rps": len(results) / wall if wall > 0 else 0,
+        "goodput": len(good) / wall if wall > 0 else 0,
+        "attainment": len(good) / issued if issued else 0,
+        "tps": sum(r["tokens"] for r in results) / wall if wall > 0 else 0,
+        "ttft": percentile(ttfts, 50) if ttfts else None,
+        "ttft_p95": percentile(ttfts, 95),
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+    }
+
+def format_open_loop_rate(level):
+    return (f"{level['rate']:>6.2f} rps offered | {level['achieved_rps']:>6.2f} done/s"
+            f" | goodput {level['goodput']:>6.2f} rps | SLO {level['attainment'] * 100:>5.1f}%"
+            f" | TTFT p50/p95 {level['ttft'] or 0:.2f}/{level['ttft_p95']:.2f}s"
+            f" | latency p50/p95/p99 {level['p50']:.2f}/{level['p95']:.2f}/{level['p99']:.2f}s"
+            f" | {level['errors']} errors")
+
+def run_open_loop(backend, url, model, prompt_files, session_dir, config):
+    prompts = {p: load_prompt(p) for p in prompt_files}
+    weights = [config["prompt_weights"].get(p, 1) for p in prompt_files]
+    
+    print(f"\n🔄 Open-loop testing {model}...")
+    print(f"📝 Prompt mix: {', '.join(f'{p} (w={w})' for p, w in zip(prompt_files, weights))}")
+    print(f"⏱️  {config['open_loop_arrival']} arrivals, {config['open_loop_duration']}s per rate")
+    print(f"🎯 SLO: TTFT ≤ {config['slo_ttft']}s, latency ≤ {config['slo_latency']}s, "
+          f"target {config['slo_target'] * 100:.0f}% of requests\n")
+    
+    report = []
+    for rate in config["open_loop_rates"]:
+        print(f"  ⏳ {rate} req/s...")
+        level = run_open_loop_rate(backend, url, model, prompts, weights, rate, session_dir, config)
+        print(f"  {format_open_loop_rate(level)}")
+        report.append(level)
+        if level["attainment"] < config["slo_target"]:
+            print("  ⛔ SLO violated, stopping the rate sweep")
+            break
+    
+    sustainable = [l["rate"] for l in report if l["attainment"] >= config["slo_target"]]
+    max_rps = max(sustainable) if sustainable else 0
+    print(f"\n✅ Max sustainable rate: {max_rps} req/s")
+    save_open_loop_result(backend, model, prompt_files, weights, report, max_rps, config)
+    return report, max_rps
+
+def save_open_loop_result(backend, model, prompt_files, weights, report, max_rps, config):
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    
+    with open(RESULTS_FILE, 'a', encoding='utf-8') as f:
+        f.write("=" * 80 + "\n")
+        f.write(f"OPEN-LOOP REPORT - {timestamp}\n")
+        f.write("=" * 80 + "\n\n")
+        
+        f.write(f"Backend: {backend.upper()}\n")
+        f.write(f"Model: {model}\n")
+        f.write(f"Prompt Mix: {', '.join(f'{p} (w={w})' for p, w in zip(prompt_files, weights))}\n")
+        f.write(f"Arrivals: {config['open_loop_arrival']}, {config['open_loop_duration']}s per rate\n")
+        f.write(f"SLO: TTFT <= {config['slo_ttft']}s, latency <= {config['slo_latency']}s, "
+                f"target {config['slo_target'] * 100:.0f}%\n\n")
+        
+        f.write("RATE SWEEP:\n")
+        for level in report:
+            f.write(f"  {format_open_loop_rate(level)}\n")
+        
+        f.write(f"\nMAX SUSTAINABLE RATE: {max_rps} req/s\n")
+        f.write("\n\n")
+
+def unload_model(backend, url, model):
+    if backend == "ollama":
+        # An empty generate with keep_alive 0 evicts the model immediately
+        r = http_session(url).post(f"{url}/api/generate", json={"model": model, "keep_alive": 0}, timeout=60)
+        r.raise_for_status()
+        deadline = time.perf_counter() + 30
+        while time.perf_counter() < deadline:
+            try:
+                loaded = [m["name"] for m in http_session(url).get(f"{url}/api/ps", timeout=5).json().get("models", [])]
+            except Exception:
+                return True
+            if model not in loaded:
+                return True
+            time.sleep(0.2)
+        return False
+    # llama.cpp router mode; plain llama-server and LM Studio have no unload endpoint
+    try:
+        r = http_session(url).post(f"{url}/models/unload", json={"model": model}, timeout=60)
+        return r.ok
+    except Exception:
+        return False
+
+def run_cold_start(backend, url, model, prompt, prompt_file, session_dir, config):
+    print(f"\n🔄 Cold start testing {model}...")
+    print(f"📝 Prompt: {prompt[:60]}..." if len(prompt) > 60 else f"📝 Prompt: {prompt}")
+    print(f"🔁 Cycles: {config['cold_start_cycles']}, steady-state runs per cycle: {config['cold_start_steady_runs']}\n")
+    
+    # Streaming gives the client-side TTFT of the first request, which includes the load
+    test_fn = get_test_fn(backend, {**config, "streaming": True})
+    cycles = []
+    for cycle in range(1, config["cold_start_cycles"] + 1):
+        try:
+            unloaded = unload_model(backend, url, model)
+        except Exception as e:
+            print(f"  Cycle {cycle}: ❌ Unload error - {e}")
+            continue
+        if not unloaded:
+            print(f"  ⚠️  {backend} cannot force an unload, the first request may hit a loaded model")
+        
+        try:
+            first, payload, response = test_fn(url, model, prompt)
+        except Exception as e:
+            record_run("cold_start", backend, url, model, prompt_file, f"cold{cycle}", session_dir, config,
+                       error=str(e), variant="cold")
+            print(f"  Cycle {cycle}: ❌ Error - {e}")
+            continue
+        save_request_response(backend, model, prompt_file, prompt, payload, response, f"cold{cycle}", session_dir,
+                              sent_at=first["sent_at"])
+        record_run("cold_start", backend, url, model, prompt_file, f"cold{cycle}", session_dir, config, first,
+                   extra={"unloaded": unloaded}, variant="cold")
+        print(f"  Cycle {cycle} first request: {format_metrics(first)}")
+        
+        steady = []
+        for i in range(1, config["cold_start_steady_runs"] + 1):
+            try:
+                metrics, payload, response = test_fn(url, model, prompt)
+            except Exception as e:
+                record_run("cold_start", backend, url, model, prompt_file, f"steady{cycle}_{i}", session_dir,
+                           config, error=str(e), variant="steady")
+                print(f"  Cycle {cycle} steady {i}: ❌ Error - {e}")
+                continue
+            steady.append(metrics)
+            save_request_response(backend, model, prompt_file, prompt, payload, response,
+                                  f"steady{cycle}_{i}", session_dir, sent_at=metrics["sent_at"])
+            record_run("cold_start", backend, url, model, prompt_file, f"steady{cycle}_{i}", session_dir,
+                       config, metrics, variant="steady")
+            print(f"  Cycle {cycle} steady {i}: {format_metrics(metrics)}")
+        
+        steady_ttft = average_metric(steady, "ttft")
+        load_time = first["server"].get("load")
+        if load_time is None and steady_ttft is not None and first["ttft"] is not None:
+            # No server-side load timer: the extra TTFT over a warm request is the load cost
+            load_time = max(first["ttft"] - steady_ttft, 0)
+        cycles.append({
+            "unloaded": unloaded,
+            "load_time": load_time,
+            "first_latency": first["elapsed"],
+            "first_ttft": first["ttft"],
+            "steady_ttft": steady_ttft,
+            "steady_tps": average_metric(steady, "tps"),
+            "steady_decode_tps": average_metric(steady, "decode_tps"),
+            "server": first["server"],
+        })
+        print(f"  Cycle {cycle}: {format_cold_start_cycle(cycles[-1])}\n")
+    
+    if not cycles:
+        return None
+    save_cold_start_result(backend, model, prompt_file, cycles)
+    return {
+        "tps": average_metric(cycles, "steady_tps") or 0,
+        "ttft": average_metric(cycles, "first_ttft"),
+        "decode_tps": average_metric(cycles, "steady_decode_tps"),
+        "load_time": average_metric(cycles, "load_time"),
+        "first_latency": average_metric(cycles, "first_latency"),
+    }
+
+def format_cold_start_cycle(cycle):
+    def seconds(value):
+        return f"{value:.3f}s" if value is not None else "-"
+    line = (f"load {seconds(cycle['load_time'])} | first request {seconds(cycle['first_latency'])}"
+            f" (TTFT {seconds(cycle['first_ttft'])}) | warm TTFT {seconds(cycle['steady_ttft'])}")
+    if cycle["steady_tps"] is not None:
+        line += f" | steady {cycle['steady_tps']:.2f} tok/s"
+    if cycle["server"]:
+        line += " | server " + ", ".join(f"{k} {v:.2f}s" for k, v in cycle["server"].items())
+    if not cycle["unloaded"]:
+        line += " | ⚠️ not unloaded"
+    return line
+
+def save_cold_start_result(backend, model, prompt_file, cycles):
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    
+    with open(RESULTS_FILE, 'a', encoding='utf-8') as f:
+        f.write("=" * 80 + "\n")
+        f.write(f"COLD START REPORT - {timestamp}\n")
+        f.write("=" * 80 + "\n\n")
+        
+        f.write(f"Backend: {backend.upper()}\n")
+        f.write(f"Model: {model}\n")
+        f.write(f"Prompt File: {prompt_file}\n\n")
+        
+        f.write("CYCLES:\n")
+        for i, cycle in enumerate(cycles, 1):
+            f.write(f"  Cycle {i}: {format_cold_start_cycle(cycle)}\n")
+        
+        load_time = average_metric(cycles, "load_time")
+        if load_time is not None:
+            f.write(f"\nAVG LOAD TIME: {load_time:.2f}s\n")
+        f.write(f"AVG FIRST REQUEST: {average_metric(cycles, 'first_latency'):.2f}s\n")
+        steady_tps = average_metric(cycles, "steady_tps")
+        if steady_tps is not None:
+            f.write(f"AVG STEADY STATE: {steady_tps:.2f} tok/s\n")
+        f.write("\n\n")
+
+def prefill_seconds(metrics):
+    # Prefer the server's own prompt processing time, fall back to client TTFT
+    server = metrics.get("server") or {}
+    return server.get("prompt_eval") if server.get("prompt_eval") is not None else metrics.get("ttft")
+
+def run_prefix_cache(backend, url, model, prompt, prompt_file, session_dir, config):
+    suffixes = config["prefix_cache_suffixes"]
+    use_context = backend == "ollama" and config["prefix_cache_ollama_context"]
+    print(f"\n🔄 Prefix cache testing {model}...")
+    print(f"📝 Shared prefix: {prompt_file} (~{count_tokens(prompt)} tokens)")
+    print(f"🔁 Suffixes: {len(suffixes)}" + (", reusing Ollama context" if use_context else "") + "\n")
+    
+    test_fn = get_test_fn(backend, {**config, "streaming": True})
+    max_tokens = config["prefix_cache_max_tokens"]
+    if backend == "ollama":
+        extra = {"options": {"num_predict": max_tokens}}
+    else:
+        # llama.cpp only reuses the KV cache across requests with cache_prompt
+        extra = {"max_tokens": max_tokens, "cache_prompt": True}
+    
+    # A unique marker at the very start makes the first request a guaranteed cache miss
+    prefix = f"[benchmark {datetime.now().isoformat()}]\n{prompt}\n\n"
+    runs = []
+    context = None
+    for i, suffix in enumerate(suffixes, 1):
+        if use_context and context is not None:
+            request_prompt, request_extra = suffix, {**extra, "context": context}
+        else:
+            request_prompt, request_extra = prefix + suffix, extra
+        try:
+            metrics, payload, response = test_fn(url, model, request_prompt, request_extra)
+        except Exception as e:
+            record_run("prefix_cache", backend, url, model, prompt_file, i, session_dir, config, error=str(e),
+                       variant="warm" if runs else "cold")
+            print(f"  Request {i}: ❌ Error - {e}")
+            continue
+        if use_context and context is None:
+            context = response.get("context")
+        save_request_response(backend, model, prompt_file, request_prompt, payload, response, f"prefix{i}", session_dir,
+                              sent_at=metrics["sent_at"])
+        processed = (response.get("timings") or {}).get("prompt_n")
+        record_run("prefix_cache", backend, url, model, prompt_file, i, session_dir, config, metrics,
+                   extra={"cached": bool(runs), "prompt_processed": processed}, variant="warm" if runs else "cold")
+        runs.append({"prefill": prefill_seconds(metrics), "ttft": metrics["ttft"], "processed": processed,
+                     "metrics": metrics})
+        note = f" | {processed} prompt tokens processed" if processed is not None else ""
+        label = "cold" if len(runs) == 1 else "warm"
+        print(f"  Request {i} ({label}): prefill {runs[-1]['prefill'] or 0:.3f}s | {format_metrics(metrics)}{note}")
+    
+    if len(runs) < 2 or not runs[0]["prefill"]:
+        print("\n❌ Not enough successful requests to compare cold and warm prefill")
+        return None
+    warm = [r["prefill"] for r in runs[1:] if r["prefill"] is not None]
+    warm_prefill = statistics.median(warm) if warm else None
+    speedup = runs[0]["prefill"] / warm_prefill if warm_prefill else None
+    result = {
+        "cold_prefill": runs[0]["prefill"],
+        "warm_prefill": warm_prefill,
+        "cache_speedup": speedup,
+        "cold_ttft": runs[0]["ttft"],
+        "warm_ttft": statistics.median([r["ttft"] for r in runs[1:] if r["ttft"] is not None] or [0]),
+    }
+    print(f"\n✅ {format_prefix_cache(result)}")
+    save_prefix_cache_result(backend, model, prompt_file, prompt, runs, result, use_context)
+    return {
+        "tps": average_metric([r["metrics"] for r in runs], "tps"),
+        "ttft": result["warm_ttft"],
+        "prefill_tps": average_metric([r["metrics"] for r in runs[1:]], "prefill_tps"),
+        "cache_speedup": speedup,
+    }
+
+def format_prefix_cache(result):
+    speedup = f"{result['cache_speedup']:.1f}x" if result["cache_speedup"] else "-"
+    return (f"Cold prefill {result['cold_prefill']:.3f}s → warm {result['warm_prefill'] or 0:.3f}s"
+            f" (cache speedup {speedup}) | TTFT cold {result['cold_ttft'] or 0:.3f}s,"
+            f" warm {result['warm_ttft'] or 0:.3f}s")
+
+def save_prefix_cache_result(backend, model, prompt_file, prompt, runs, result, use_context):
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    
+    with open(RESULTS_FILE, 'a', encoding='utf-8') as f:
+        f.write("=" * 80 + "\n")
+        f.write(f"PREFIX CACHE REPORT - {timestamp}\n")
+        f.write("=" * 80 + "\n\n")
+        
+        f.write(f"Backend: {backend.upper()}\n")
+        f.write(f"Model: {model}\n")
+        f.write(f"Prefix File: {prompt_file} (~{count_tokens(prompt)} tokens)\n")
+        f.write(f"Ollama Context Reuse: {'yes' if use_context else 'no'}\n\n")
+        
+        f.write("REQUESTS:\n")
+        for i, run in enumerate(runs, 1):
+            processed = f", {run['processed']} prompt tokens processed" if run["processed"] is not None else ""
+            f.write(f"  Request {i} ({'cold' if i == 1 else 'warm'}): prefill {run['prefill'] or 0:.3f}s"
+                    f"{processed} | {format_metrics(run['metrics'])}\n")
+        
+        f.write(f"\n{format_prefix_cache(result)}\n")
+        f.write("\n\n")
+
+CONTEXT_SWEEP_INSTRUCTION = "\n\nSummarize the text above in one sentence."
+
+def synthesize_prompt(corpus, target_tokens, chars_per_token):
+    # Repeat the corpus as needed, then cut it to the target size
+    needed = int(target_tokens * chars_per_token) - len(CONTEXT_SWEEP_INSTRUCTION)
+    text = corpus * (needed // len(corpus) + 1)
+    return text[:max(needed, 0)] + CONTEXT_SWEEP_INSTRUCTION
+
+def run_context_sweep(backend, url, model, prompt_files, session_dir, config):
+    corpus = "\n\n".join(load_prompt(p) for p in prompt_files)
+    lengths = config["context_sweep_lengths"]
+    max_tokens = config["context_sweep_max_tokens"]
+    print(f"\n🔄 Context length sweep for {model}...")
+    print(f"📝 Corpus: {', '.join(prompt_files)} ({len(corpus)} chars)")
+    print(f"📏 Lengths: {', '.join(str(n) for n in lengths)} tokens\n")
+    
+    test_fn = get_test_fn(backend, {**config, "streaming": True})
+    # Start from the backend tokenizer (or the rough 4 chars/token guess), then
+    # calibrate on the server's own counts after every step
+    chars_per_token = 4.0
+    sample = corpus[:20000]
+    sample_tokens = None if backend == "ollama" else tokenize_endpoint(url, sample)
+    if sample_tokens:
+        chars_per_token = len(sample) / sample_tokens
+    rows = []
+    for target in lengths:
+        prompt = synthesize_prompt(corpus, target, chars_per_token)
+        if backend == "ollama":
+            # Ollama silently truncates to num_ctx, so size the window for every step
+            extra = {"options": {"num_ctx": target + max_tokens + 256, "num_predict": max_tokens}}
+        else:
+            extra = {"max_tokens": max_tokens}
+        try:
+            metrics, payload, response = test_fn(url, model, prompt, extra)
+        except Exception as e:
+            record_run("context_sweep", backend, url, model, f"synthetic_{target}t", target, session_dir, config,
+                       error=str(e))
+            print(f"  {target:>7} tokens: ❌ Error - {e}")
+            print("  ⛔ Stopping the sweep, longer prompts will not fit either")
+            break
+        save_request_response(backend, model, f"synthetic_{target}t", prompt, payload, response, target, session_dir,
+                              sent_at=metrics["sent_at"])
+        record_run("context_sweep", backend, url, model, f"synthetic_{target}t", target, session_dir, config, metrics,
+                   extra={"target_tokens": target})
+        
+        prompt_tokens = metrics["prompt_tokens"]
+        if prompt_tokens:
+            chars_per_token = len(prompt) / prompt_tokens
+        server_prefill = (metrics.get("server") or {}).get("prompt_eval")
+        row = {
+            "model": model,
+            "target_tokens": target,
+            "prompt_tokens": prompt_tokens,
+            "ttft": metrics["ttft"],
+            # Server prompt time excludes any reload Ollama does when num_ctx changes
+            "prefill_tps": prompt_tokens / server_prefill if prompt_tokens and server_prefill else metrics["prefill_tps"],
+            "decode_tps": metrics["decode_tps"],
+            "tokens": metrics["tokens"],
+            "elapsed": metrics["elapsed"],
+        }
+        rows.append(row)
+        print(f"  {format_context_sweep_row(row)}")
+    
+    if rows:
+        session_dir.mkdir(parents=True, exist_ok=True)
+        # The same model can be swept on several backends within one session
+        csv_file = session_dir / f"context_sweep_{backend}_{model.replace('/', '_').replace(':', '_')}.csv"
+        with open(csv_file, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+        print(f"\n💾 CSV saved to: {csv_file}")
+        save_context_sweep_result(backend, model, prompt_files, rows)
+    return rows
+
+def format_context_sweep_row(row):
+    def optional(value, fmt):
+        return format(value, fmt) if value is not None else "-"
+    return (f"{row['target_tokens']:>7} tokens (actual {optional(row['prompt_tokens'], '>7')})"
+            f" | TTFT {optional(row['ttft'], '>8.3f')}s"
+            f" | prefill {optional(row['prefill_tps'], '>9.1f')} tok/s"
+            f" | decode {optional(row['decode_tps'], '>7.1f')} tok/s")
+
+def save_context_sweep_result(backend, model, prompt_files, rows):
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    
+    with open(RESULTS_FILE, 'a', encoding='utf-8') as f:
+        f.write("=" * 80 + "\n")
+        f.write(f"CONTEXT LENGTH SWEEP - {timestamp}\n")
+        f.write("=" * 80 + "\n\n")
+        
+        f.write(f"Backend: {backend.upper()}\n")
+        f.write(f"Model: {model}\n")
+        f.write(f"Corpus: {', '.join(prompt_files)}\n\n")
+        
+        f.write("RESULTS:\n")
+        for row in rows:
+            f.write(f"  {format_context_sweep_row(row)}\n")
+        f.write("\n\n")
+
+# Ollama applies these per request; llama.cpp and LM Studio only take them at server start
+BACKEND_OPTION_KEYS = ["num_ctx", "num_thread", "num_batch", "num_gpu"]
+
+def params_to_request(backend, params):
+    # Sampling keys override the config, backend options go into the Ollama "options" object
+    overrides = {k: v for k, v in params.items() if k not in BACKEND_OPTION_KEYS}
+    options = {k: v for k, v in params.items() if k in BACKEND_OPTION_KEYS}
+    if backend != "ollama" or not options:
+        return overrides, None
+    return overrides, {"options": options}
+
+def run_sweep(backend, url, model, prompt, prompt_file, session_dir, config):
+    grid = dict(config["sweep_grid"])
+    if backend != "ollama":
+        skipped = [k for k in grid if k in BACKEND_OPTION_KEYS]
+        if skipped:
+            print(f"⚠️  {backend} takes {', '.join(skipped)} as server flags, not per request; left out of the sweep")
+        grid = {k: v for k, v in grid.items() if k not in BACKEND_OPTION_KEYS}
+    combos = expand_params(grid)
+    budget = config["sweep_latency_budget"]
+    print(f"\n🔄 Parameter sweep for {model}...")
+    print(f"🧮 {len(combos)} combination(s) of {', '.join(grid) or 'nothing'}, "
+          f"{config['sweep_iterations']} iteration(s) each")
+    if budget is not None:
+        print(f"🎯 Latency budget: p95 ≤ {budget}s")
+    
+    rows = []
+    for params in combos:
+        overrides, extra = params_to_request(backend, params)
+        print(f"\n⚙️  {format_params(params) or 'defaults'}")
+        summary = run_benchmark(backend, url, model, prompt, prompt_file, config["sweep_iterations"],
+                                session_dir, {**config, **overrides}, extra=extra, mode="sweep")
+        if summary:
+            rows.append({**summary, "params": params})
+    
+    if not rows:
+        return rows, None
+    rows.sort(key=lambda r: r["tps"], reverse=True)
+    eligible = [r for r in rows if budget is None or r["latency_p95"] <= budget]
+    best = eligible[0] if eligible else None
+    print(f"\n{'=' * 60}")
+    for row in rows:
+        print(f"  {format_sweep_row(row, budget)}")
+    if best:
+        print(f"\n🏆 Best within budget: {format_params(best['params']) or 'defaults'} ({best['tps']:.2f} tok/s)")
+    else:
+        print("\n❌ No combination met the latency budget")
+    save_sweep_result(backend, model, prompt_file, rows, best, budget)
+    return rows, best
+
+def format_sweep_row(row, budget):
+    within = "" if budget is None else (" ✔" if row["latency_p95"] <= budget else " ✘ over budget")
+    decode = f" | decode {row['decode_tps']:>7.2f} tok/s" if row.get("decode_tps") else ""
+    return (f"{format_params(row['params']) or 'defaults':<50} | {row['tps']:>8.2f} tok/s{decode}"
+            f" | p95 {row['latency_p95']:.2f}s{within}")
+
+def save_sweep_result(backend, model, prompt_file, rows, best, budget):
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    
+    with open(RESULTS_FILE, 'a', encoding='utf-8') as f:
+        f.write("=" * 80 + "\n")
+        f.write(f"PARAMETER SWEEP - {timestamp}\n")
+        f.write("=" * 80 + "\n\n")
+        
+        f.write(f"Backend: {backend.upper()}\n")
+        f.write(f"Model: {model}\n")
+        f.write(f"Prompt File: {prompt_file}\n")
+        f.write(f"Latency Budget: {f'p95 <= {budget}s' if budget is not None else 'none'}\n\n")
+        
+        f.write("COMBINATIONS (fastest first):\n")
+        for row in rows:
+            f.write(f"  {format_sweep_row(row, budget)}\n")
+        
+        if best:
+            f.write(f"\nBEST WITHIN BUDGET: {format_params(best['params']) or 'defaults'} ({best['tps']:.2f} tok/s)\n")
+        else:
+            f.write("\nBEST WITHIN BUDGET: none\n")
+        f.write("\n\n")
+
+def fixed_length_extra(backend, tokens, seed):
+    if backend == "ollama":
+        # Ollama has no ignore_eos; num_predict is only an upper bound there
+        return {"options": {"num_predict": tokens, "seed": seed}}
+    # ignore_eos is honoured by llama.cpp, min_tokens by vLLM-style servers
+    return {"max_tokens": tokens, "min_tokens": tokens, "ignore_eos": True, "seed": seed}
+
+def run_fixed_length(backend, url, model, prompt, prompt_file, session_dir, config):
+    tokens = config["fixed_output_tokens"]
+    print(f"\n📏 Fixed output length: {tokens} tokens, greedy, seed {config['fixed_output_seed']}")
+    # Greedy decoding with a fixed seed keeps the generated text the same across runs
+    fixed_config = {**config, "temperature": 0, "max_tokens": tokens, "streaming": True}
+    summary = run_benchmark(backend, url, model, prompt, prompt_file, config["test_iterations"], session_dir,
+                            fixed_config, extra=fixed_length_extra(backend, tokens, config["fixed_output_seed"]),
+                            mode="fixed_length")
+    if not summary:
+        return None
+    short = sum(1 for n in summary["output_tokens"] if n < tokens)
+    if short:
+        print(f"  ⚠️  {short} run(s) stopped before {tokens} tokens ({backend} may not support ignore_eos);"
+              f" ranking uses decode speed")
+    decode_tps = summary["decode_tps"]
+    # Rank on decode rate and compare latency at exactly the target length, whatever the model produced
+    normalized = summary["ttft"] + (tokens - 1) / decode_tps if decode_tps and summary["ttft"] is not None else None
+    return {**summary, "tps": decode_tps or summary["tps"], "fixed_tokens": tokens, "short_runs": short,
+            "normalized_latency": normalized}
+
+def chunk_corpus(corpus, chunk_tokens, max_chunks):
+    # ~4 chars per token, cut at the last whitespace so words stay whole
+    size = chunk_tokens * 4
+    chunks, pos = [], 0
+    while pos < len(corpus) and len(chunks) < max_chunks:
+        end = min(pos + size, len(corpus))
+        if end < len(corpus):
+            space = corpus.rfind(" ", pos + size // 2, end)
+            end = space if space > 0 else end
+        chunk = corpus[pos:end].strip()
+        if chunk:
+            chunks.append(chunk)
+        pos = end
+    return chunks
+
+def test_embeddings(backend, url, model, inputs):
+    if backend == "ollama":
+        endpoint, payload = f"{url}/api/embed", {"model": model, "input": inputs}
+    else:
+        endpoint, payload = f"{url}/v1/embeddings", {"model": model, "input": inputs}
+    reset_connect_time()
+    start = time.perf_counter()
+    r = http_session(url).post(endpoint, json=payload, timeout=request_timeout())
+    r.raise_for_status()
+    data = r.json()
+    connect_time = take_connect_time()
+    elapsed = time.perf_counter() - start - connect_time
+    if backend == "ollama":
+        vectors = data.get("embeddings", [])
+        tokens = data.get("prompt_eval_count")
+    else:
+        vectors = [item["embedding"] for item in data.get("data", [])]
+        tokens = (data.get("usage") or {}).get("prompt_tokens")
+    if len(vectors) != len(inputs):
+        raise ValueError(f"expected {len(inputs)} vectors, got {len(vectors)}")
+    return {
+        "elapsed": elapsed,
+        "latency": elapsed,
+        "vectors": len(vectors),
+        "dims": len(vectors[0]) if vectors else 0,
+        # Not every server reports usage; fall back to the usual estimate
+        "prompt_tokens": tokens or sum(count_tokens(text) for text in inputs),
+        "connect_time": connect_time,
+    }
+
+def get_embed_fn(backend):
+    # Same shape as get_test_fn so the live dashboard can track batches too
+    embed_fn = lambda u, m, inputs, extra=None: (test_embeddings(backend, u, m, inputs),)
+    if _dashboard is not None:
+        return _dashboard.track(embed_fn)
+    return embed_fn
+
+def run_embedding_level(backend, url, model, chunks, chunk_tokens, batch_size, session_dir, config):
+    concurrency = config["embed_concurrency"]
+    embed_fn = get_embed_fn(backend)
+    batches = [chunks[i:i + batch_size] for i in range(0, len(chunks), batch_size)]
+    results, errors = [], 0
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = {pool.submit(embed_fn, url, model, batch): i for i, batch in enumerate(batches, 1)}
+        for future in as_completed(futures):
+            run = f"e{chunk_tokens}_b{batch_size}_{futures[future]}"
+            extra = {"batch_size": batch_size, "chunk_tokens": chunk_tokens}
+            try:
+                metrics = future.result()[0]
+            except Exception as e:
+                errors += 1
+                record_run("embeddings", backend, url, model, f"chunks_{chunk_tokens}t", run, session_dir, config,
+                           error=str(e), concurrency=concurrency, extra=extra, variant=f"batch={batch_size}")
+                print(f"    ❌ Batch error - {e}")
+                continue
+            results.append(metrics)
+            record_run("embeddings", backend, url, model, f"chunks_{chunk_tokens}t", run, session_dir, config,
+                       metrics, concurrency=concurrency, extra={**extra, "vectors": metrics["vectors"]},
+                       variant=f"batch={batch_size}")
+    wall = time.perf_counter() - wall_start
+    
+    latencies = [r["latency"] for r in results]
+    vectors = sum(r["vectors"] for r in results)
+    tokens = sum(r["prompt_tokens"] for r in results)
+    return {
+        "chunk_tokens": chunk_tokens,
+        "batch_size": batch_size,
+        "concurrency": concurrency,
+        "batches": len(results),
+        "errors": errors,
+        "vectors": vectors,
+        "dims": results[0]["dims"] if results else 0,
+        "wall": wall,
+        "vectors_per_s": vectors / wall if wall > 0 else 0,
+        "tokens_per_s": tokens / wall if wall > 0 else 0,
+        "p50": percentile(latencies, 50) if latencies else None,
+        "p95": percentile(latencies, 95) if latencies else None,
+        "p99": percentile(latencies, 99) if latencies else None,
+    }
+
+def format_embedding_level(level):
+    return (f"chunk {level['chunk_tokens']:>5}t batch {level['batch_size']:>4}"
+            f" | {level['vectors_per_s']:>9.2f} vectors/s | {level['tokens_per_s']:>10.1f} tok/s"
+            f" | batch latency p50/p95/p99 {format_optional(level['p50'], '.3f')}/{format_optional(level['p95'], '.3f')}"
+            f"/{format_optional(level['p99'], '.3f')}s | {level['batches']} ok, {level['errors']} errors")
+
+def run_embeddings(backend, url, model, prompt_files, session_dir, config):
+    corpus = "\n\n".join(load_prompt(p) for p in prompt_files)
+    print(f"\n🔄 Embedding throughput for {model}...")
+    print(f"📝 Corpus: {', '.join(prompt_files)} ({len(corpus)} chars)")
+    print(f"📦 Chunk sizes: {', '.join(str(n) for n in config['embed_chunk_sizes'])} tokens,"
+          f" batch sizes: {', '.join(str(n) for n in config['embed_batch_sizes'])},"
+          f" concurrency {config['embed_concurrency']}\n")
     
-    # Add custom models for this backend
-    if custom_models:
-        models.extend(custom_models)
+    report = []
+    for chunk_tokens in config["embed_chunk_sizes"]:
+        chunks = chunk_corpus(corpus, chunk_tokens, config["embed_max_chunks"])
+        if not chunks:
+            continue
+        for batch_size in config["embed_batch_sizes"]:
+            print(f"  ⏳ {len(chunks)} chunks of ~{chunk_tokens} tokens, batch {batch_size}...")
+            level = run_embedding_level(backend, url, model, chunks, chunk_tokens, batch_size, session_dir, config)
+            print(f"  {format_embedding_level(level)}")
+            report.append(level)
     
-    return models
+    if any(level["batches"] for level in report):
+        save_embeddings_result(backend, model, prompt_files, report, config)
+    return report
 
-def get_openai_models(url, custom_models=None):
-    try:
-        r = requests.get(f"{url}/v1/models", timeout=2)
-        models = [m["id"] for m in r.json()["data"]]
-    except:
-        models = []
-    
-    # Add custom models for this backend
-    if custom_models:
-        models.extend(custom_models)
+def save_embeddings_result(backend, model, prompt_files, report, config):
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     
-    return models
+    with open(RESULTS_FILE, 'a', encoding='utf-8') as f:
+        f.write("=" * 80 + "\n")
+        f.write(f"EMBEDDINGS REPORT - {timestamp}\n")
+        f.write("=" * 80 + "\n\n")
+        
+        f.write(f"Backend: {backend.upper()}\n")
+        f.write(f"Model: {model}\n")
+        f.write(f"Corpus: {', '.join(prompt_files)}\n")
+        f.write(f"Concurrency: {config['embed_concurrency']}\n\n")
+        
+        f.write("BATCH SWEEP:\n")
+        for level in report:
+            f.write(f"  {format_embedding_level(level)}\n")
+        
+        best = max(report, key=lambda x: x["vectors_per_s"])
+        f.write(f"\nPEAK: {best['vectors_per_s']:.2f} vectors/s at chunk {best['chunk_tokens']}t,"
+                f" batch {best['batch_size']}\n")
+        f.write("\n\n")
 
-def test_ollama(url, model, prompt):
-    start = time.time()
-    payload = {"model": model, "prompt": prompt, "stream": False}
-    r = requests.post(f"{url}/api/generate", json=payload)
-    elapsed = time.time() - start
-    data = r.json()
-    tokens = data.get("eval_count", 0)
-    return elapsed, tokens, payload, data
+def embed_command(args, config):
+    try:
+        target = resolve_cli_backend(args.backend, config)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return 1
+    for key in ("batch_sizes", "chunk_sizes", "concurrency"):
+        if getattr(args, key):
+            config[f"embed_{key}"] = getattr(args, key)
+    session_dir = TEMP_DIR / datetime.now().strftime("%Y%m%d_%H%M%S")
+    report = run_embeddings(target["backend"], target["url"], args.model, args.prompts or get_prompts(),
+                            session_dir, config)
+    failures = sum(level["errors"] for level in report)
+    return 1 if failures or not report else 0
 
-def test_openai(url, model, prompt, config):
-    start = time.time()
-    payload = {
-        "model": model,
-        "messages": [{"role": "user", "content": prompt}],
-        "stream": False,
-        "temperature": config["temperature"],
-        "max_tokens": config["max_tokens"],
-        "top_p": config["top_p"],
-        "repeat_penalty": config["repeat_penalty"]
-    }
-    r = requests.post(f"{url}/v1/chat/completions", json=payload)
-    elapsed = time.time() - start
-    data = r.json()
-    tokens = data["usage"]["completion_tokens"]
-    return elapsed, tokens, payload, data
+def format_summary_line(model, prompt_file, summary):
+    line = f"{model:<40} | {prompt_file:<30} | {summary['tps']:>6.2f} tok/s"
+    if summary.get("ttft") is not None:
+        line += f" | TTFT {summary['ttft'] * 1000:>6.0f}ms"
+    if summary.get("prefill_tps"):
+        line += f" | prefill {summary['prefill_tps']:>8.1f} tok/s"
+    if summary.get("decode_tps"):
+        line += f" | decode {summary['decode_tps']:>6.1f} tok/s"
+    if summary.get("p95") is not None:
+        line += f" | p95 {summary['p95']:>6.2f}s"
+    if summary.get("load_time") is not None:
+        line += f" | load {summary['load_time']:>6.2f}s"
+    if summary.get("cache_speedup"):
+        line += f" | cache {summary['cache_speedup']:>5.1f}x"
+    if summary.get("normalized_latency") is not None:
+        line += f" | {summary['fixed_tokens']} tok in {summary['normalized_latency']:>6.2f}s"
+    if summary.get("short_runs"):
+        line += f" | {summary['short_runs']} short"
+    if summary.get("tps_per_core"):
+        line += f" | {summary['tps_per_core']:>6.2f} tok/s/core"
+    if summary.get("tps_per_gb"):
+        line += f" | {summary['tps_per_gb']:>6.2f} tok/s/GB"
+    return line
 
-def save_request_response(backend, model, prompt_file, prompt, payload, response, run_num, session_dir):
-    session_dir.mkdir(parents=True, exist_ok=True)
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")[:-3]
-    prompt_name = Path(prompt_file).stem
-    model_safe = model.replace("/", "_").replace(":", "_")
+def write_performance_summary(performance_file, results_summary):
+    results_summary.sort(key=lambda x: x[2]["tps"], reverse=True)
+    with open(performance_file, 'w', encoding='utf-8') as f:
+        f.write("=" * 80 + "\n")
+        f.write("📊 PERFORMANCE SUMMARY (Fastest to Slowest)\n")
+        f.write("=" * 80 + "\n\n")
+        for i, (m, p, summ) in enumerate(results_summary, 1):
+            f.write(f"{i}. {format_summary_line(m, p, summ)}\n")
+        f.write("\n" + "=" * 80 + "\n")
+
+HISTOGRAM_BUCKETS = [0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60]
+
+_dashboard = None
+
+class _DashboardStream:
+    # Stands in for stdout/stderr while the dashboard is up; printed lines go to its log panel
+    def __init__(self, dashboard):
+        self.dashboard = dashboard
+        # print() writes the text and the newline separately, so every thread assembles its own line
+        self.buffers = {}
     
-    base_name = f"{timestamp}_{backend}_{model_safe}_{prompt_name}_run{run_num}"
+    def write(self, text):
+        thread = threading.get_ident()
+        with self.dashboard.lock:
+            *lines, rest = (self.buffers.pop(thread, "") + text).split("\n")
+            if rest:
+                self.buffers[thread] = rest
+            self.dashboard.lines.extend(line for line in lines if line.strip())
+        return len(text)
     
-    # Request file
-    request_data = {
-        "backend": backend,
-        "model": model,
-        "prompt_file": prompt_file,
-        "timestamp": timestamp,
-        "run": run_num,
-        "payload": payload,
-        "prompt": prompt
-    }
-    (session_dir / f"{base_name}.req").write_text(json.dumps(request_data, indent=2, ensure_ascii=False))
+    def flush(self):
+        pass
+
+class Dashboard:
+    def __init__(self, title, window, refresh=0.5):
+        self.title = title
+        self.window = window
+        self.refresh = refresh
+        self.lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.next_id = 0
+        self.in_flight = {}
+        self.completed = deque()
+        self.totals = Counter()
+        self.errors = Counter()
+        self.lines = deque(maxlen=10)
+        self.stop = threading.Event()
+        self.stdout = sys.stdout
+        self.stderr = sys.stderr
     
-    # Response file - JSON format
-    (session_dir / f"{base_name}.res.json").write_text(json.dumps(response, indent=2, ensure_ascii=False))
+    def track(self, test_fn):
+        def tracked(url, model, prompt, extra=None):
+            with self.lock:
+                self.next_id += 1
+                request_id = self.next_id
+                # Embedding batches pass a list of inputs instead of one prompt
+                chars = len(prompt) if isinstance(prompt, str) else sum(len(text) for text in prompt)
+                self.in_flight[request_id] = (model, chars, time.perf_counter())
+            try:
+                result = test_fn(url, model, prompt, extra)
+            except Exception:
+                with self.lock:
+                    self.in_flight.pop(request_id, None)
+                    self.errors[model] += 1
+                raise
+            metrics = result[0]
+            with self.lock:
+                self.in_flight.pop(request_id, None)
+                self.totals[model] += 1
+                tokens = metrics["tokens"] if "tokens" in metrics else metrics["prompt_tokens"]
+                self.completed.append((time.perf_counter(), model, tokens,
+                                       metrics.get("ttft"), metrics["elapsed"]))
+            return result
+        return tracked
     
-    # Response file - Formatted markdown
-    try:
-        if backend == "ollama":
-            content = response.get("response", "")
-        else:
-            # OpenAI format - check for thinking/reasoning
-            message = response.get("choices", [{}])[0].get("message", {})
-            content = message.get("content", "")
-            
-            # Check if there's a thinking/reasoning process
-            thinking = None
-            if "reasoning_content" in message:
-                thinking = message.get("reasoning_content")
-            elif "thinking" in message:
-                thinking = message.get("thinking")
-            
-            # Format with thinking section if exists
-            if thinking:
-                formatted_content = f"## 🧠 Düşünme Süreci\n\n```\n{thinking}\n```\n\n---\n\n## 💬 Cevap\n\n{content}"
-            else:
-                formatted_content = content
+    def histogram(self, values, width):
+        counts = [0] * (len(HISTOGRAM_BUCKETS) + 1)
+        for value in values:
+            counts[next((i for i, edge in enumerate(HISTOGRAM_BUCKETS) if value <= edge), len(HISTOGRAM_BUCKETS))] += 1
+        peak = max(counts) or 1
+        labels = [f"≤{edge}s" for edge in HISTOGRAM_BUCKETS] + [f">{HISTOGRAM_BUCKETS[-1]}s"]
+        # Only the populated range of buckets, to keep the screen short
+        used = [i for i, count in enumerate(counts) if count]
+        first, last = (used[0], used[-1]) if used else (0, 0)
+        return [f"  {labels[i]:>7} {'█' * round(counts[i] / peak * width):<{width}} {counts[i]}"
+                for i in range(first, last + 1)]
+    
+    def render(self):
+        now = time.perf_counter()
+        width = shutil.get_terminal_size((100, 40)).columns
+        with self.lock:
+            while self.completed and now - self.completed[0][0] > self.window:
+                self.completed.popleft()
+            completed = list(self.completed)
+            in_flight = list(self.in_flight.values())
+            lines = list(self.lines)
+            totals, errors = Counter(self.totals), Counter(self.errors)
         
-        (session_dir / f"{base_name}.res.md").write_text(formatted_content if backend != "ollama" else content, encoding='utf-8')
-    except:
-        pass
-
-def run_benchmark(backend, url, model, prompt, prompt_file, iterations, session_dir, config):
-    print(f"\n🔄 Testing {model}...")
-    print(f"📝 Prompt: {prompt[:60]}..." if len(prompt) > 60 else f"📝 Prompt: {prompt}")
-    print(f"🔁 Iterations: {iterations}\n")
-    results = []
+        span = min(self.window, now - self.started) or 1
+        out = [f"╔{'═' * 50}╗", f"║ {self.title[:48]:<48} ║", f"╚{'═' * 50}╝", ""]
+        out.append(f"⏱️  {now - self.started:6.0f}s elapsed | {len(in_flight)} in flight | "
+                   f"rolling {sum(c[2] for c in completed) / span:8.2f} tok/s (last {self.window}s)")
+        
+        out.append("\n🔄 In flight:")
+        for model, prompt_chars, start in sorted(in_flight, key=lambda r: r[2])[:8]:
+            out.append(f"  {model:<40} {prompt_chars:>8} chars  {now - start:6.1f}s")
+        if len(in_flight) > 8:
+            out.append(f"  ... {len(in_flight) - 8} more")
+        
+        out.append("\n📊 Per model (rolling window):")
+        for model in sorted(set(totals) | set(errors)):
+            done = [c for c in completed if c[1] == model]
+            ttfts = [c[3] for c in done if c[3] is not None]
+            latencies = [c[4] for c in done]
+            ttft = f"{percentile(ttfts, 50):.2f}/{percentile(ttfts, 95):.2f}s" if ttfts else "-"
+            latency = f"{percentile(latencies, 50):.2f}/{percentile(latencies, 95):.2f}s" if latencies else "-"
+            out.append(f"  {model[:24]:<24} {totals[model]:>4} done {errors[model]:>3} err"
+                       f" | {sum(c[2] for c in done) / span:8.2f} tok/s"
+                       f" | TTFT p50/p95 {ttft} | latency p50/p95 {latency}")
+        
+        ttfts = [c[3] for c in completed if c[3] is not None]
+        latencies = [c[4] for c in completed]
+        if latencies:
+            out.append("\n📈 Latency histogram:")
+            out.extend(self.histogram(latencies, 30))
+        if ttfts:
+            out.append("\n⚡ TTFT histogram:")
+            out.extend(self.histogram(ttfts, 30))
+        
+        out.append("\n📝 Log:")
+        out.extend(f"  {line}" for line in lines)
+        # Home the cursor and overwrite in place; erase leftovers after the last line
+        return "\033[H" + "\n".join(line[:width] + "\033[K" for line in out) + "\n\033[J"
     
-    test_fn = test_ollama if backend == "ollama" else lambda u, m, p: test_openai(u, m, p, config)
+    def run(self):
+        while not self.stop.wait(self.refresh):
+            self.stdout.write(self.render())
+            self.stdout.flush()
     
-    for i in range(iterations):
-        try:
-            elapsed, tokens, payload, response = test_fn(url, model, prompt)
-            tps = tokens / elapsed if elapsed > 0 else 0
-            results.append((elapsed, tokens, tps))
-            save_request_response(backend, model, prompt_file, prompt, payload, response, i+1, session_dir)
-            print(f"  Run {i+1}: {tps:.2f} tok/s ({tokens} tokens in {elapsed:.2f}s)")
-        except Exception as e:
-            print(f"  Run {i+1}: ❌ Error - {e}")
+    def __enter__(self):
+        global _dashboard
+        _dashboard = self
+        clear_screen()
+        sys.stdout = _DashboardStream(self)
+        # Warnings and tracebacks would otherwise draw over the panel
+        sys.stderr = _DashboardStream(self)
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return self
     
-    if results:
-        avg_tps = sum(r[2] for r in results) / len(results)
-        print(f"\n✅ Average: {avg_tps:.2f} tok/s")
-        save_result(backend, model, prompt_file, prompt, results, iterations)
-        return avg_tps
-    return 0
+    def __exit__(self, *exc):
+        global _dashboard
+        self.stop.set()
+        self.thread.join()
+        self.stdout.write(self.render())
+        sys.stdout = self.stdout
+        sys.stderr = self.stderr
+        _dashboard = None
+
+@contextmanager
+def live_dashboard(title, config):
+    # Plain scrolling output when disabled or when not attached to a terminal
+    if not config.get("live_dashboard", True) or not sys.stdout.isatty():
+        yield None
+        return
+    with Dashboard(title, config["dashboard_window"]) as dashboard:
+        yield dashboard
 
 def main_menu(config):
     options = [
@@ -301,7 +2774,7 @@ def test_menu(backend, url, config):
         models = get_openai_models(url, custom_models)
     
     if not models:
-        os.system('clear' if os.name != 'nt' else 'cls')
+        clear_screen()
         print(f"❌ No models found or {backend} not running at {url}")
         input("\nPress Enter to continue...")
         return
@@ -330,17 +2803,21 @@ def prompt_menu(backend, url, models, config):
     prompts = get_prompts()
     
     if not prompts:
-        os.system('clear' if os.name != 'nt' else 'cls')
+        clear_screen()
         print("❌ No prompts found in prompts/")
         input("\nPress Enter to continue...")
         return
     
-    # Add token count to prompt names
+    # Add token count to prompt names; exact counts come from the token index or /tokenize
+    tokenizer = tokenizer_key(backend, models[0])
+    fetch = backend_token_counter(backend, url, models[0])
     prompt_options = []
     for p in prompts:
-        prompt_text = load_prompt(p)
-        token_count = count_tokens(prompt_text)
-        prompt_options.append(f"{p} (~{token_count} tokens)")
+        token_count, exact = prompt_token_count(p, tokenizer, fetch)
+        if not exact:
+            # Backend has no tokenize endpoint; don't retry it for every file
+            fetch = None
+        prompt_options.append(f"{p} ({'' if exact else '~'}{token_count} tokens)")
     
     choices = menu_select("Select Prompts", prompt_options, multi_select=True)
     
@@ -349,7 +2826,33 @@ def prompt_menu(backend, url, models, config):
     
     selected_prompts = [prompts[i] for i in choices]
     
-    os.system('clear' if os.name != 'nt' else 'cls')
+    mode = menu_select("Select Benchmark Mode", BENCHMARK_MODES)
+    if mode is None:
+        return
+    
+    # A single test keeps the prompt preview and the ENTER/ESC confirmation
+    if len(models) == 1 and len(selected_prompts) == 1 and mode not in (2, 5, 8):
+        prompt = load_prompt(selected_prompts[0])
+        clear_screen()
+        print(f"\n{'='*60}")
+        print(f"Model: {models[0]}")
+        print(f"Prompt: {selected_prompts[0]}")
+        print(f"{'='*60}")
+        print("\n📝 First 10 lines of prompt:")
+        print("-" * 60)
+        for line in prompt.split('\n')[:10]:
+            print(line)
+        if len(prompt.split('\n')) > 10:
+            print("...")
+        print("-" * 60)
+        print("\nPress ENTER to start test, ESC to skip...")
+        key = readchar.readkey()
+        if key == readchar.key.ESC:
+            print("⏭️  Skipped")
+            time.sleep(0.5)
+            return
+    
+    clear_screen()
     
     # Create session directory with timestamp
     session_timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -358,59 +2861,79 @@ def prompt_menu(backend, url, models, config):
     
     results_summary = []
     
-    for model in models:
-        for prompt_file in selected_prompts:
-            prompt = load_prompt(prompt_file)
-            lines = prompt.split('\n')[:10]
-            
-            os.system('clear' if os.name != 'nt' else 'cls')
-            print(f"\n{'='*60}")
-            print(f"Model: {model}")
-            print(f"Prompt: {prompt_file}")
-            print(f"{'='*60}")
-            print("\n📝 First 10 lines of prompt:")
-            print("-" * 60)
-            for line in lines:
-                print(line)
-            if len(prompt.split('\n')) > 10:
-                print("...")
-            print("-" * 60)
-            
-            if len(models) > 1 or len(selected_prompts) > 1:
-                print("\n⏩ Auto-running (multiple tests mode)...")
-                time.sleep(1)
-            else:
-                print("\nPress ENTER to start test, ESC to skip...")
-                key = readchar.readkey()
-                if key == readchar.key.ESC:
-                    print("⏭️  Skipped")
-                    time.sleep(0.5)
-                    continue
-            
-            avg_tps = run_benchmark(backend, url, model, prompt, prompt_file, config["test_iterations"], session_dir, config)
-            if avg_tps > 0:
-                results_summary.append((model, prompt_file, avg_tps))
-                
-                # Update performance file after each test
-                results_summary.sort(key=lambda x: x[2], reverse=True)
-                with open(performance_file, 'w', encoding='utf-8') as f:
-                    f.write("=" * 80 + "\n")
-                    f.write("📊 PERFORMANCE SUMMARY (Fastest to Slowest)\n")
-                    f.write("=" * 80 + "\n\n")
-                    for i, (m, p, tps) in enumerate(results_summary, 1):
-                        f.write(f"{i}. {m:<40} | {p:<30} | {tps:>6.2f} tok/s\n")
-                    f.write("\n" + "=" * 80 + "\n")
+    with live_dashboard(f"{backend.upper()} - {BENCHMARK_MODES[mode]}", config):
+        if mode == 2:
+            # Open loop drives the whole prompt mix at once instead of prompt by prompt
+            for model in models:
+                report, max_rps = run_open_loop(backend, url, model, selected_prompts, session_dir, config)
+                for level in report:
+                    results_summary.append((model, f"mix @{level['rate']}rps", level))
+                if results_summary:
+                    write_performance_summary(performance_file, results_summary)
+        elif mode == 5:
+            # The selected prompts form the corpus that synthetic prompts are cut from
+            for model in models:
+                for row in run_context_sweep(backend, url, model, selected_prompts, session_dir, config):
+                    summary = {"tps": row["tokens"] / row["elapsed"] if row["elapsed"] else 0, **row}
+                    results_summary.append((model, f"context {row['target_tokens']}", summary))
+                if results_summary:
+                    write_performance_summary(performance_file, results_summary)
+        elif mode == 8:
+            # Like the context sweep, the selected prompts are one corpus to chunk
+            for model in models:
+                for level in run_embeddings(backend, url, model, selected_prompts, session_dir, config):
+                    if level["batches"]:
+                        results_summary.append((model, f"embed {level['chunk_tokens']}t x{level['batch_size']}",
+                                                {"tps": level["tokens_per_s"], "p95": level["p95"]}))
+                if results_summary:
+                    write_performance_summary(performance_file, results_summary)
+        else:
+            for model in models:
+                for prompt_file in selected_prompts:
+                    prompt = load_prompt(prompt_file)
+                    print(f"▶️  Model: {model} | Prompt: {prompt_file}")
+                    
+                    if mode == 1:
+                        for level in run_load_test(backend, url, model, prompt, prompt_file, session_dir, config):
+                            results_summary.append((model, f"{prompt_file} @c{level['concurrency']}", level))
+                    elif mode == 3:
+                        summary = run_cold_start(backend, url, model, prompt, prompt_file, session_dir, config)
+                        if summary:
+                            results_summary.append((model, f"{prompt_file} (cold)", summary))
+                    elif mode == 4:
+                        summary = run_prefix_cache(backend, url, model, prompt, prompt_file, session_dir, config)
+                        if summary:
+                            results_summary.append((model, f"{prompt_file} (prefix cache)", summary))
+                    elif mode == 7:
+                        summary = run_fixed_length(backend, url, model, prompt, prompt_file, session_dir, config)
+                        if summary:
+                            results_summary.append((model, f"{prompt_file} ({summary['fixed_tokens']} tok)", summary))
+                    elif mode == 6:
+                        rows, _ = run_sweep(backend, url, model, prompt, prompt_file, session_dir, config)
+                        for row in rows:
+                            results_summary.append((model, f"{prompt_file} [{format_params(row['params'])}]", row))
+                    else:
+                        summary = run_benchmark(backend, url, model, prompt, prompt_file, config["test_iterations"], session_dir, config)
+                        if summary and summary["tps"] > 0:
+                            results_summary.append((model, prompt_file, summary))
+                    
+                    # Update performance file after each test
+                    if results_summary:
+                        write_performance_summary(performance_file, results_summary)
+    
+    # Artifacts were written in the background while the tests ran
+    flush_artifacts()
     
     if results_summary:
-        os.system('clear' if os.name != 'nt' else 'cls')
+        clear_screen()
         print("\n" + "="*80)
         print("📊 PERFORMANCE SUMMARY (Fastest to Slowest)")
         print("="*80 + "\n")
         
-        results_summary.sort(key=lambda x: x[2], reverse=True)
+        results_summary.sort(key=lambda x: x[2]["tps"], reverse=True)
         
-        for i, (model, prompt_file, tps) in enumerate(results_summary, 1):
-            print(f"{i}. {model:<40} | {prompt_file:<30} | {tps:>6.2f} tok/s")
+        for i, (model, prompt_file, summary) in enumerate(results_summary, 1):
+            print(f"{i}. {format_summary_line(model, prompt_file, summary)}")
         
         print("\n" + "="*80)
         print(f"\n💾 Performance summary saved to: temp/{session_timestamp}/performans.txt")
@@ -427,18 +2950,38 @@ def settings_menu(config):
         f"Max Tokens: {config['max_tokens']}",
         f"Top P: {config['top_p']}",
         f"Repeat Penalty: {config['repeat_penalty']}",
+        f"Streaming (TTFT/decode metrics): {'on' if config['streaming'] else 'off'}",
+        f"Warm-up Runs: {config['warmup_runs']}",
+        f"Adaptive Iterations: {'on' if config['adaptive_iterations'] else 'off'}",
+        f"Live Dashboard: {'on' if config['live_dashboard'] else 'off'}",
+        f"Artifacts: {config['artifacts']}",
         "Back"
     ]
     
     while True:
         choice = menu_select("Settings", options)
         
-        if choice is None or choice == 8:
+        if choice is None or choice == 13:
             save_config(config)
             break
         
-        os.system('clear' if os.name != 'nt' else 'cls')
-        if choice == 0:
+        clear_screen()
+        if choice == 8:
+            config["streaming"] = not config["streaming"]
+        elif choice == 9:
+            try:
+                config["warmup_runs"] = int(input("Enter warm-up runs: ").strip())
+            except:
+                pass
+        elif choice == 10:
+            config["adaptive_iterations"] = not config["adaptive_iterations"]
+        elif choice == 11:
+            config["live_dashboard"] = not config["live_dashboard"]
+        elif choice == 12:
+            # jsonl -> files -> metrics only
+            config["artifacts"] = ARTIFACT_MODES[(ARTIFACT_MODES.index(config["artifacts"]) + 1) % len(ARTIFACT_MODES)]
+            configure_artifacts(config)
+        elif choice == 0:
             config["ollama_url"] = input("Enter Ollama URL: ").strip()
         elif choice == 1:
             config["llamacpp_url"] = input("Enter llama.cpp URL: ").strip()
@@ -479,6 +3022,11 @@ def settings_menu(config):
             f"Max Tokens: {config['max_tokens']}",
             f"Top P: {config['top_p']}",
             f"Repeat Penalty: {config['repeat_penalty']}",
+            f"Streaming (TTFT/decode metrics): {'on' if config['streaming'] else 'off'}",
+            f"Warm-up Runs: {config['warmup_runs']}",
+            f"Adaptive Iterations: {'on' if config['adaptive_iterations'] else 'off'}",
+            f"Live Dashboard: {'on' if config['live_dashboard'] else 'off'}",
+            f"Artifacts: {config['artifacts']}",
             "Back"
         ]
 
@@ -500,7 +3048,7 @@ def manage_custom_models(backend, config):
         
         if choice == len(models):
             # Add new model
-            os.system('clear' if os.name != 'nt' else 'cls')
+            clear_screen()
             model_name = input("Enter model name: ").strip()
             if model_name and model_name not in config["custom_models"][backend]:
                 config["custom_models"][backend].append(model_name)
@@ -519,7 +3067,8 @@ def remote_servers_menu(config):
     
     while True:
         servers = config["remote_servers"]
-        options = [f"{s['name']} ({s['url']})" for s in servers] + ["Add new server", "Remove server", "Test server", "Back"]
+        options = [f"{s['name']} ({s['url']})" for s in servers] + [
+            "Add new server", "Remove server", "Test server", "Test all servers (fleet)", "Back"]
         
         choice = menu_select("Remote Servers", options)
         
@@ -529,7 +3078,7 @@ def remote_servers_menu(config):
         
         if choice == len(servers):
             # Add new server
-            os.system('clear' if os.name != 'nt' else 'cls')
+            clear_screen()
             name = input("Enter server name: ").strip()
             url = input("Enter server URL: ").strip()
             backend = input("Enter backend type (ollama/openai): ").strip().lower()
@@ -550,12 +3099,852 @@ def remote_servers_menu(config):
                 if test_choice is not None:
                     server = servers[test_choice]
                     test_menu(server["backend"], server["url"], config)
+        elif choice == len(servers) + 3:
+            # Fleet: every server in parallel
+            if servers:
+                fleet_menu(config)
 
-if __name__ == "__main__":
+def fleet_menu(config):
+    prompts = get_prompts()
+    choices = menu_select("Fleet Benchmark - Select Prompts", prompts, multi_select=True)
+    if not choices:
+        return
+    clear_screen()
+    session_dir = TEMP_DIR / datetime.now().strftime("%Y%m%d_%H%M%S")
+    with live_dashboard("Fleet Benchmark", config) as dashboard:
+        ranking, _ = run_fleet(config["remote_servers"], [prompts[i] for i in choices], session_dir, config)
+        flush_artifacts()
+    if dashboard and ranking:
+        # The ranking was printed into the dashboard log, show it in full again
+        clear_screen()
+        print("🏆 FLEET RANKING (host × model × prompt, fastest to slowest)\n")
+        for i, row in enumerate(ranking, 1):
+            print(f"{i}. {format_summary_line(row['server'] + '/' + row['model'], row['prompt_file'], row)}")
+    input("\n✅ Tests complete. Press Enter to continue...")
+
+def discover_fleet(servers, config):
+    def discover(server):
+        custom_models = config.get("custom_models", {}).get(server["backend"], [])
+        if server["backend"] == "ollama":
+            return get_ollama_models(server["url"], custom_models)
+        return get_openai_models(server["url"], custom_models)
+    
+    with ThreadPoolExecutor(max_workers=max(len(servers), 1)) as pool:
+        return dict(zip([s["name"] for s in servers], pool.map(discover, servers)))
+
+def run_fleet_task(server, model, prompt_file, session_dir, config):
+    backend, url = server["backend"], server["url"]
+    prompt = load_prompt(prompt_file)
+    test_fn = get_test_fn(backend, config)
+    label = f"[{server['name']}] {model} | {prompt_file}"
+    
+    for i in range(config["warmup_runs"]):
+        try:
+            test_fn(url, model, prompt)
+        except Exception as e:
+            print(f"  {label} | warm-up ❌ {e}")
+    
+    results, errors = [], 0
+    for i in range(1, config["test_iterations"] + 1):
+        run = f"{server['name']}_{i}"
+        try:
+            start = time.perf_counter()
+            metrics, payload, response = test_fn(url, model, prompt)
+            metrics["latency"] = time.perf_counter() - start
+        except Exception as e:
+            errors += 1
+            record_run("fleet", backend, url, model, prompt_file, run, session_dir, config, error=str(e),
+                       extra={"server": server["name"]}, variant=f"server={server['name']}")
+            print(f"  {label} | run {i} ❌ {e}")
+            continue
+        results.append(metrics)
+        save_request_response(backend, model, prompt_file, prompt, payload, response, run, session_dir,
+                              sent_at=metrics["sent_at"])
+        record_run("fleet", backend, url, model, prompt_file, run, session_dir, config, metrics,
+                   extra={"server": server["name"]}, variant=f"server={server['name']}")
+        print(f"  {label} | run {i}: {format_metrics(metrics)}")
+    
+    return {
+        "server": server["name"],
+        "model": model,
+        "prompt_file": prompt_file,
+        "errors": errors,
+        "runs": len(results),
+        "tps": average_metric(results, "tps") or 0,
+        "ttft": average_metric(results, "ttft"),
+        "decode_tps": average_metric(results, "decode_tps"),
+        "p95": percentile([r["latency"] for r in results], 95) if results else None,
+    }
+
+def run_fleet(servers, prompt_files, session_dir, config, model_filter=None):
+    print(f"🔎 Discovering models on {len(servers)} server(s)...")
+    fleet = discover_fleet(servers, config)
+    for server in servers:
+        models = fleet[server["name"]]
+        if model_filter:
+            models = [m for m in models if any(f in m for f in model_filter)]
+            fleet[server["name"]] = models
+        status = f"{len(models)} model(s)" if models else "❌ unreachable or no matching models"
+        print(f"  {server['name']:<20} {server['url']:<35} {status}")
+    print()
+    
+    limit = config["fleet_server_concurrency"]
+    
+    def run_server(server):
+        # Each server gets its own pool, so a slow box never holds up the others
+        tasks = [(model, prompt_file) for model in fleet[server["name"]] for prompt_file in prompt_files]
+        with ThreadPoolExecutor(max_workers=limit) as pool:
+            return list(pool.map(lambda t: run_fleet_task(server, t[0], t[1], session_dir, config), tasks))
+    
+    active = [s for s in servers if fleet[s["name"]]]
+    failures = len(servers) - len(active)
+    ranking = []
+    if active:
+        with ThreadPoolExecutor(max_workers=len(active)) as pool:
+            for rows in pool.map(run_server, active):
+                ranking.extend(rows)
+    
+    failures += sum(row["errors"] for row in ranking)
+    ranking = [row for row in ranking if row["runs"]]
+    ranking.sort(key=lambda row: row["tps"], reverse=True)
+    
+    if ranking:
+        summary = [(f"{row['server']}/{row['model']}", row["prompt_file"], row) for row in ranking]
+        session_dir.mkdir(parents=True, exist_ok=True)
+        write_performance_summary(session_dir / "performans.txt", summary)
+        print("\n" + "=" * 80)
+        print("🏆 FLEET RANKING (host × model × prompt, fastest to slowest)")
+        print("=" * 80 + "\n")
+        for i, (label, prompt_file, row) in enumerate(summary, 1):
+            print(f"{i}. {format_summary_line(label, prompt_file, row)}")
+        print(f"\n💾 Performance summary saved to: {session_dir / 'performans.txt'}")
+    if failures:
+        print(f"\n❌ {failures} failure(s) across the fleet")
+    return ranking, failures
+
+MATRIX_KEYS = {"backends", "models", "prompts", "params", "iterations", "concurrency", "streaming"}
+
+def load_matrix(path):
+    path = Path(path)
+    try:
+        text = path.read_text()
+    except OSError as e:
+        sys.exit(f"❌ Cannot read matrix {path}: {e.strerror or e}")
+    if path.suffix in (".yaml", ".yml"):
+        try:
+            import yaml
+        except ImportError:
+            sys.exit("❌ PyYAML is required for YAML matrices (pip install pyyaml), or use JSON")
+        try:
+            return yaml.safe_load(text)
+        except yaml.YAMLError as e:
+            sys.exit(f"❌ Invalid YAML in {path}: {e}")
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError as e:
+        sys.exit(f"❌ Invalid JSON in {path}: {e}")
+
+def validate_matrix(matrix):
+    # Catch typos up front, a CI job must never pass green while benchmarking nothing
+    if not isinstance(matrix, dict):
+        return ["the matrix must be a mapping"]
+    problems = []
+    unknown = sorted(set(matrix) - MATRIX_KEYS)
+    if unknown:
+        problems.append(f"unknown key(s): {', '.join(unknown)} (expected {', '.join(sorted(MATRIX_KEYS))})")
+    backends = matrix.get("backends")
+    if not isinstance(backends, list) or not backends:
+        problems.append("'backends' must be a non-empty list")
+    else:
+        for i, entry in enumerate(backends, 1):
+            if isinstance(entry, dict) and ("name" in entry or "remote" in entry):
+                continue
+            if not isinstance(entry, str):
+                problems.append(f"backend #{i} needs a 'name' or 'remote' key")
+    prompts = matrix.get("prompts", "all")
+    if prompts != "all" and (not isinstance(prompts, list) or not all(isinstance(p, str) for p in prompts)):
+        problems.append("'prompts' must be \"all\" or a list of prompt file names")
+    models = matrix.get("models")
+    if models is not None and (not isinstance(models, list) or not all(isinstance(m, str) for m in models)):
+        problems.append("'models' must be a list of model names")
+    if not isinstance(matrix.get("params", {}), dict):
+        problems.append("'params' must be a mapping of parameter -> value or list of values")
+    concurrency = matrix.get("concurrency")
+    levels = concurrency if isinstance(concurrency, list) else [concurrency]
+    if concurrency is not None and not all(isinstance(n, int) and n > 0 for n in levels):
+        problems.append("'concurrency' must be a positive integer or a list of them")
+    iterations = matrix.get("iterations")
+    if iterations is not None and not (isinstance(iterations, int) and iterations > 0):
+        problems.append("'iterations' must be a positive integer")
+    return problems
+
+def resolve_backend(entry, config):
+    # Entries are "ollama"/"llamacpp"/"lmstudio", {"remote": name} or {"name", "url", "backend"}
+    if isinstance(entry, str):
+        entry = {"name": entry}
+    if "remote" in entry:
+        server = next((s for s in config["remote_servers"] if s["name"] == entry["remote"]), None)
+        if server is None:
+            raise ValueError(f"unknown remote server '{entry['remote']}'")
+        return {"label": server["name"], "backend": server["backend"], "url": server["url"],
+                "models": entry.get("models")}
+    name = entry["name"]
+    url = entry.get("url") or config.get(f"{name}_url")
+    if not url:
+        raise ValueError(f"no URL configured for backend '{name}'")
+    return {"label": name, "backend": entry.get("backend", name), "url": url,
+            "models": entry.get("models")}
+
+def expand_params(params):
+    # {"temperature": [0.2, 0.7], "max_tokens": 512} -> one dict per combination
+    params = params or {}
+    keys = list(params)
+    grids = [v if isinstance(v, list) else [v] for v in params.values()]
+    return [dict(zip(keys, combo)) for combo in itertools.product(*grids)]
+
+def format_params(params):
+    return ", ".join(f"{k}={v}" for k, v in params.items())
+
+def run_matrix(matrix, config, dry_run=False):
+    problems = validate_matrix(matrix)
+    if problems:
+        for problem in problems:
+            print(f"❌ Invalid matrix: {problem}")
+        return 1
+    prompts = matrix.get("prompts", "all")
+    if prompts == "all":
+        prompts = get_prompts()
+    missing = [p for p in prompts if not (PROMPTS_DIR / p).exists()]
+    if missing:
+        print(f"❌ Unknown prompts: {', '.join(missing)}")
+        return 1
+    
+    concurrency = matrix.get("concurrency")
+    base = dict(config)
+    base["test_iterations"] = matrix.get("iterations", config["test_iterations"])
+    if "streaming" in matrix:
+        base["streaming"] = matrix["streaming"]
+    
+    session_dir = TEMP_DIR / datetime.now().strftime("%Y%m%d_%H%M%S")
+    performance_file = session_dir / "performans.txt"
+    results_summary = []
+    failures = 0
+    planned = 0
+    
+    for entry in matrix["backends"]:
+        try:
+            target = resolve_backend(entry, config)
+        except ValueError as e:
+            print(f"❌ {e}")
+            failures += 1
+            continue
+        
+        models = target["models"] or matrix.get("models")
+        if not models:
+            custom_models = config.get("custom_models", {}).get(target["backend"], [])
+            if target["backend"] == "ollama":
+                models = get_ollama_models(target["url"], custom_models)
+            else:
+                models = get_openai_models(target["url"], custom_models)
+        if not models:
+            print(f"❌ No models found or {target['label']} not running at {target['url']}")
+            failures += 1
+            continue
+        
+        grid = dict(matrix.get("params") or {})
+        if target["backend"] != "ollama":
+            skipped = [k for k in grid if k in BACKEND_OPTION_KEYS]
+            if skipped:
+                print(f"⚠️  {target['label']} takes {', '.join(skipped)} as server flags, not per request; "
+                      f"left out of its runs")
+            grid = {k: v for k, v in grid.items() if k not in BACKEND_OPTION_KEYS}
+        param_sets = expand_params(grid)
+        
+        for model, prompt_file, params in itertools.product(models, prompts, param_sets):
+            overrides, extra = params_to_request(target["backend"], params)
+            run_config = {**base, **overrides}
+            label = f"{target['label']}/{model}"
+            tag = f"{prompt_file} [{format_params(params)}]" if params else prompt_file
+            planned += 1
+            if dry_run:
+                mode = f"load {concurrency}" if concurrency else f"{run_config['test_iterations']} iterations"
+                print(f"  {label} | {tag} | {mode}")
+                continue
+            
+            prompt = load_prompt(prompt_file)
+            if concurrency:
+                run_config["concurrency_levels"] = concurrency if isinstance(concurrency, list) else [concurrency]
+                report = run_load_test(target["backend"], target["url"], model, prompt, prompt_file,
+                                       session_dir, run_config, extra=extra)
+                failures += sum(level["errors"] for level in report)
+                failures += len(run_config["concurrency_levels"]) - len(report)
+                for level in report:
+                    results_summary.append((label, f"{tag} @c{level['concurrency']}", level))
+            else:
+                summary = run_benchmark(target["backend"], target["url"], model, prompt, prompt_file,
+                                        run_config["test_iterations"], session_dir, run_config, extra=extra)
+                if summary is None:
+                    failures += 1
+                    continue
+                failures += summary["errors"]
+                results_summary.append((label, tag, summary))
+            
+            write_performance_summary(performance_file, results_summary)
+    
+    if results_summary:
+        print("\n" + "=" * 80)
+        print("📊 PERFORMANCE SUMMARY (Fastest to Slowest)")
+        print("=" * 80 + "\n")
+        for i, (model, prompt_file, summary) in enumerate(results_summary, 1):
+            print(f"{i}. {format_summary_line(model, prompt_file, summary)}")
+        print(f"\n💾 Performance summary saved to: {performance_file}")
+    
+    if failures:
+        print(f"\n❌ {failures} failed run(s)")
+    if not planned:
+        print("\n❌ The matrix did not produce any runs")
+    return 1 if failures or not planned else 0
+
+def tokenize_prompts(args, config):
+    try:
+        target = resolve_cli_backend(args.backend, config)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return 1
+    fetch = backend_token_counter(target["backend"], target["url"], args.model, probe=args.probe)
+    tokenizer = tokenizer_key(target["backend"], args.model)
+    
+    failures = 0
+    for prompt_file in args.prompts or get_prompts():
+        try:
+            count, exact = prompt_token_count(prompt_file, tokenizer, fetch)
+        except Exception as e:
+            print(f"❌ {prompt_file}: {e}")
+            failures += 1
+            continue
+        if not exact:
+            failures += 1
+        approx, _ = prompt_token_count(prompt_file)
+        status = f"{count} tokens (estimate was ~{approx})" if exact else f"~{count} tokens (no tokenizer available)"
+        print(f"  {prompt_file:<50} {status}")
+    return 1 if failures else 0
+
+def add_run_filter_args(parser):
+    parser.add_argument("--backend")
+    parser.add_argument("--model", help="substring match")
+    parser.add_argument("--prompt", help="substring match on prompt file")
+    parser.add_argument("--session", help="session id (temp/<session>)")
+    parser.add_argument("--mode", help="standard, load, open_loop, ...")
+    parser.add_argument("--since", help="ISO timestamp, e.g. 2024-05-01")
+    parser.add_argument("--until", help="ISO timestamp (exclusive)")
+
+RATE_BUCKETS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000]
+# Short probes often answer within tens of milliseconds; the dashboard buckets start at 0.1s
+TTFT_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.15, 0.25, 0.5, 0.75, 1, 2.5, 5, 10]
+
+class MetricsRegistry:
+    # Prometheus text exposition format by hand, so the daemon needs no client library
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+        self.help = {}
+    
+    def define(self, name, kind, help_text, buckets=None):
+        self.help[name] = (kind, help_text, buckets)
+        (self.histograms if kind == "histogram" else self.counters)[name] = {}
+    
+    def observe(self, name, labels, value):
+        buckets = self.help[name][2]
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            series = self.histograms[name].setdefault(key, {"buckets": [0] * len(buckets), "sum": 0.0, "count": 0})
+            for i, edge in enumerate(buckets):
+                if value <= edge:
+                    series["buckets"][i] += 1
+            series["sum"] += value
+            series["count"] += 1
+    
+    def inc(self, name, labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            self.counters[name][key] = self.counters[name].get(key, 0) + 1
+    
+    @staticmethod
+    def format_labels(key, extra=None):
+        def escape(value):
+            return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs = list(key) + (extra or [])
+        return "{" + ",".join(f'{k}="{escape(v)}"' for k, v in pairs) + "}"
+    
+    def render(self):
+        out = []
+        with self.lock:
+            for name, (kind, help_text, buckets) in self.help.items():
+                out.append(f"# HELP {name} {help_text}")
+                out.append(f"# TYPE {name} {kind}")
+                if kind == "counter":
+                    for key, value in self.counters[name].items():
+                        out.append(f"{name}{self.format_labels(key)} {value}")
+                    continue
+                for key, series in self.histograms[name].items():
+                    # Buckets are already cumulative: every edge >= value was incremented
+                    for edge, count in zip(buckets, series["buckets"]):
+                        out.append(f"{name}_bucket{self.format_labels(key, [('le', edge)])} {count}")
+                    out.append(f"{name}_bucket{self.format_labels(key, [('le', '+Inf')])} {series['count']}")
+                    out.append(f"{name}_sum{self.format_labels(key)} {series['sum']}")
+                    out.append(f"{name}_count{self.format_labels(key)} {series['count']}")
+        return "\n".join(out) + "\n"
+
+def build_probe_registry():
+    registry = MetricsRegistry()
+    registry.define("llm_benchmark_ttft_seconds", "histogram", "Time to first token", TTFT_BUCKETS)
+    registry.define("llm_benchmark_latency_seconds", "histogram", "End-to-end request latency", HISTOGRAM_BUCKETS)
+    registry.define("llm_benchmark_decode_tokens_per_second", "histogram", "Decode rate", RATE_BUCKETS)
+    registry.define("llm_benchmark_prefill_tokens_per_second", "histogram", "Prompt processing rate", RATE_BUCKETS)
+    registry.define("llm_benchmark_probes_total", "counter", "Probe requests sent")
+    registry.define("llm_benchmark_errors_total", "counter", "Failed probe requests")
+    return registry
+
+def start_metrics_server(registry, host, port):
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        
+        def log_message(self, *args):
+            pass
+    
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def run_probe(probe, registry, session_dir, config):
+    target = probe["target"]
+    labels = {"backend": target["label"], "model": probe["model"], "prompt": probe["prompt"]}
+    test_fn = get_test_fn(target["backend"], {**config, "streaming": True})
+    if target["backend"] == "ollama":
+        extra = {"options": {"num_predict": config["probe_max_tokens"]}}
+    else:
+        extra = {"max_tokens": config["probe_max_tokens"]}
+    
+    registry.inc("llm_benchmark_probes_total", labels)
+    try:
+        metrics, _, _ = test_fn(target["url"], probe["model"], probe["text"], extra)
+    except Exception as e:
+        registry.inc("llm_benchmark_errors_total", labels)
+        record_run("probe", target["backend"], target["url"], probe["model"], probe["prompt"], "probe",
+                   session_dir, config, error=str(e))
+        print(f"  ❌ {target['label']}/{probe['model']} | {probe['prompt']}: {e}")
+        return
+    registry.observe("llm_benchmark_latency_seconds", labels, metrics["elapsed"])
+    if metrics["ttft"] is not None:
+        registry.observe("llm_benchmark_ttft_seconds", labels, metrics["ttft"])
+    if metrics["decode_tps"]:
+        registry.observe("llm_benchmark_decode_tokens_per_second", labels, metrics["decode_tps"])
+    if metrics["prefill_tps"]:
+        registry.observe("llm_benchmark_prefill_tokens_per_second", labels, metrics["prefill_tps"])
+    # Only the metrics are kept; artifacts would be a disk write per probe forever
+    record_run("probe", target["backend"], target["url"], probe["model"], probe["prompt"], "probe",
+               session_dir, config, metrics)
+
+def run_daemon(config):
+    probes = []
+    for entry in config["probe_set"]:
+        try:
+            target = resolve_backend(entry["backend"], config)
+        except ValueError as e:
+            print(f"❌ {e}")
+            return 1
+        probes.append({"target": target, "model": entry["model"], "prompt": entry["prompt"],
+                       "text": load_prompt(entry["prompt"])})
+    if not probes:
+        print("❌ No probe_set configured (list of {\"backend\", \"model\", \"prompt\"})")
+        return 1
+    
+    registry = build_probe_registry()
+    start_metrics_server(registry, config["metrics_host"], config["metrics_port"])
+    session_dir = TEMP_DIR / f"daemon_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    interval = config["probe_interval"]
+    print(f"📡 Serving metrics on http://{config['metrics_host']}:{config['metrics_port']}/metrics")
+    print(f"🔁 {len(probes)} probe(s) every {interval}s, one at a time\n")
+    
+    rng = random.Random()
+    try:
+        while True:
+            cycle_start = time.perf_counter()
+            # Probes run back to back, never concurrently, so the canary adds at most one request of load
+            for probe in probes:
+                run_probe(probe, registry, session_dir, config)
+            # Jitter keeps several canaries from lining up on the same server
+            delay = interval * rng.uniform(0.9, 1.1) - (time.perf_counter() - cycle_start)
+            time.sleep(max(delay, 0))
+    except KeyboardInterrupt:
+        return 0
+
+def resolve_cli_backend(name, config):
+    # Command line backends are a built-in name or a remote server name
+    entry = next((s for s in config["remote_servers"] if s["name"] == name), None)
+    return resolve_backend({"remote": name} if entry else name, config)
+
+def parse_trace_timestamp(value):
+    # save_request_response uses 20240501_120000_123; imported traces may use ISO 8601
+    try:
+        return datetime.strptime(value, "%Y%m%d_%H%M%S_%f")
+    except ValueError:
+        return datetime.fromisoformat(value)
+
+def trace_prompt(record):
+    if record.get("prompt") is not None:
+        return record["prompt"]
+    payload = record.get("payload", {})
+    if payload.get("messages"):
+        return payload["messages"][-1]["content"]
+    return payload.get("prompt")
+
+def restore_prompt(payload, prompt):
+    # Undoes strip_prompt for payloads read back from the artifact store
+    payload = dict(payload)
+    if payload.get("messages"):
+        payload["messages"] = [{**m, "content": prompt} if m.get("content") is None else m
+                               for m in payload["messages"]]
+    elif "prompt" not in payload:
+        payload["prompt"] = prompt
+    return payload
+
+def trace_api(payload):
+    # Chat completions carry a message list, Ollama's /api/generate a prompt
+    if payload.get("messages"):
+        return "openai"
+    return "ollama" if "prompt" in payload else None
+
+# OpenAI field -> Ollama option, for the sampling settings both APIs understand
+TRACE_OPTION_NAMES = {"temperature": "temperature", "top_p": "top_p", "repeat_penalty": "repeat_penalty",
+                      "seed": "seed", "stop": "stop", "max_tokens": "num_predict"}
+# Replay picks the model itself and always streams for TTFT
+REPLAY_DROPPED_KEYS = ("model", "stream", "stream_options")
+
+def translate_trace_payload(payload, target_api):
+    # Best effort: multi-turn history is flattened and options the other API lacks are dropped
+    if target_api == "ollama":
+        messages = payload.get("messages") or []
+        system = "\n\n".join(m["content"] for m in messages if m.get("role") == "system")
+        turns = [m for m in messages if m.get("role") != "system"]
+        if len(turns) == 1:
+            prompt = turns[0]["content"]
+        else:
+            prompt = "\n\n".join(f"{m['role']}: {m['content']}" for m in turns)
+        fields = {"prompt": prompt, "options": {option: payload[key] for key, option in TRACE_OPTION_NAMES.items()
+                                                if payload.get(key) is not None}}
+        if system:
+            fields["system"] = system
+        return fields
+    options = payload.get("options") or {}
+    messages = [{"role": "system", "content": payload["system"]}] if payload.get("system") else []
+    messages.append({"role": "user", "content": payload["prompt"]})
+    fields = {"messages": messages}
+    fields.update({key: options[option] for key, option in TRACE_OPTION_NAMES.items() if options.get(option) is not None})
+    return fields
+
+def replay_request(item, target_api):
+    # Fields merged over the benchmark's own payload; anything the trace did not set keeps the config value
+    if item["api"] is None:
+        return None
+    if item["api"] != target_api:
+        return translate_trace_payload(item["payload"], target_api)
+    return {k: v for k, v in item["payload"].items() if k not in REPLAY_DROPPED_KEYS}
+
+def load_trace(path):
+    # A session directory (artifacts.jsonl.gz or .req files) or a JSONL file with one request per line
+    path = Path(path)
+    if path.is_dir() or path.name.endswith(".gz"):
+        records = []
+        for record in iter_artifacts(path, with_prompts=True):
+            record.setdefault("source", f"{record['prompt_file']}#{record['run']}")
+            records.append(record)
+        for req_file in sorted(path.rglob("*.req")) if path.is_dir() else []:
+            record = json.loads(req_file.read_text(encoding="utf-8"))
+            record.setdefault("source", req_file.name)
+            records.append(record)
+    else:
+        with open(path, encoding="utf-8") as f:
+            records = [json.loads(line) for line in f if line.strip()]
+        for i, record in enumerate(records, 1):
+            record.setdefault("source", f"{path.name}:{i}")
+    
+    trace = []
+    for record in records:
+        prompt = trace_prompt(record)
+        # sent_at is when the request went out; older traces only have the completion timestamp
+        sent = record.get("sent_at") or record.get("timestamp")
+        if prompt is None or not sent:
+            continue
+        payload = record.get("payload") or {}
+        if payload:
+            payload = restore_prompt(payload, prompt)
+        trace.append({
+            "time": parse_trace_timestamp(sent),
+            "model": record.get("model"),
+            "prompt_file": record.get("prompt_file") or "trace",
+            "prompt": prompt,
+            "payload": payload,
+            "api": trace_api(payload),
+            "source": record["source"],
+        })
+    trace.sort(key=lambda r: r["time"])
+    return trace
+
+def run_replay(trace, backend, url, session_dir, config, model=None, speed=1.0, keep_timing=True):
+    # Replay needs TTFT, so always stream
+    test_fn = get_test_fn(backend, {**config, "streaming": True})
+    results, errors = [], []
+    lock = threading.Lock()
+    first = trace[0]["time"]
+    target_api = "ollama" if backend == "ollama" else "openai"
+    translated = Counter(item["api"] for item in trace if item["api"] not in (None, target_api))
+    for api, count in translated.items():
+        print(f"🔀 {count} request(s) were recorded for the {api} API and are translated for {backend}:"
+              f" conversation history is flattened and options {backend} lacks are dropped")
+    prompt_only = sum(1 for item in trace if item["api"] is None)
+    if prompt_only:
+        print(f"⚠️  {prompt_only} request(s) have no recorded payload; sent with the configured sampling settings")
+    
+    def timed_request(item, scheduled):
+        extra = replay_request(item, target_api)
+        # Queueing inside the client counts against latency, as in the open-loop mode
+        started = time.perf_counter()
+        metrics, payload, response = test_fn(url, model or item["model"], item["prompt"], extra)
+        metrics["latency"] = time.perf_counter() - scheduled
+        metrics["ttft"] = (metrics["ttft"] or metrics["elapsed"]) + (started - scheduled)
+        metrics["lag"] = started - scheduled
+        return metrics, payload, response
+    
+    def on_done(future, item, offset, run_num):
+        target_model = model or item["model"]
+        replay_extra = {"source": item["source"], "offset": offset, "original_model": item["model"]}
+        if item["api"] not in (None, target_api):
+            replay_extra["translated_from"] = item["api"]
+        try:
+            metrics, payload, response = future.result()
+        except Exception as e:
+            with lock:
+                errors.append(str(e))
+            record_run("replay", backend, url, target_model, item["prompt_file"], run_num, session_dir, config,
+                       error=str(e), extra=replay_extra)
+            print(f"  ❌ {item['source']}: {e}")
+            return
+        with lock:
+            results.append(metrics)
+        save_request_response(backend, target_model, item["prompt_file"], item["prompt"], payload, response,
+                              run_num, session_dir, sent_at=metrics["sent_at"])
+        record_run("replay", backend, url, target_model, item["prompt_file"], run_num, session_dir, config, metrics,
+                   extra=replay_extra)
+        print(f"  {offset:>8.2f}s {item['source']}: {format_metrics(metrics)}")
+    
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=config["open_loop_max_inflight"]) as pool:
+        for i, item in enumerate(trace, 1):
+            # Original inter-arrival gaps, compressed or stretched by speed
+            offset = (item["time"] - first).total_seconds() / speed if keep_timing else 0
+            scheduled = start + offset
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            future = pool.submit(timed_request, item, scheduled)
+            future.add_done_callback(lambda f, it=item, o=offset, n=f"replay{i}": on_done(f, it, o, n))
+    wall = time.perf_counter() - start
+    
+    latencies = [r["latency"] for r in results]
+    ttfts = [r["ttft"] for r in results]
+    return {
+        "requests": len(results),
+        "errors": len(errors),
+        "wall": wall,
+        "trace_span": (trace[-1]["time"] - first).total_seconds(),
+        "achieved_rps": len(results) / wall if wall > 0 else 0,
+        "tps": sum(r["tokens"] for r in results) / wall if wall > 0 else 0,
+        "per_request_tps": average_metric(results, "tps") or 0,
+        "decode_tps": average_metric(results, "decode_tps"),
+        "ttft": percentile(ttfts, 50) if ttfts else None,
+        "ttft_p95": percentile(ttfts, 95) if ttfts else None,
+        "p50": percentile(latencies, 50) if latencies else None,
+        "p95": percentile(latencies, 95) if latencies else None,
+        "p99": percentile(latencies, 99) if latencies else None,
+        "max_lag": max((r["lag"] for r in results), default=0),
+    }
+
+def format_replay_report(report):
+    return (f"{report['requests']} ok, {report['errors']} errors in {report['wall']:.1f}s"
+            f" (trace span {report['trace_span']:.1f}s) | {report['achieved_rps']:.2f} req/s"
+            f" | {report['tps']:.2f} tok/s aggregate | {report['per_request_tps']:.2f} tok/s/request"
+            f" | TTFT p50/p95 {format_optional(report['ttft'], '.2f')}/{format_optional(report['ttft_p95'], '.2f')}s"
+            f" | latency p50/p95/p99 {format_optional(report['p50'], '.2f')}/{format_optional(report['p95'], '.2f')}"
+            f"/{format_optional(report['p99'], '.2f')}s | max start lag {report['max_lag'] * 1000:.0f}ms")
+
+def save_replay_result(backend, model, trace_path, speed, keep_timing, report):
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    
+    with open(RESULTS_FILE, 'a', encoding='utf-8') as f:
+        f.write("=" * 80 + "\n")
+        f.write(f"REPLAY REPORT - {timestamp}\n")
+        f.write("=" * 80 + "\n\n")
+        
+        f.write(f"Backend: {backend.upper()}\n")
+        f.write(f"Model: {model or '(original per request)'}\n")
+        f.write(f"Trace: {trace_path}\n")
+        f.write(f"Timing: {f'original gaps x{1 / speed:g}' if keep_timing else 'as fast as possible'}\n\n")
+        
+        f.write(f"RESULT:\n  {format_replay_report(report)}\n")
+        f.write("\n\n")
+
+def replay_trace(args, config):
+    try:
+        target = resolve_cli_backend(args.backend, config)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return 1
+    if args.speed <= 0:
+        print("❌ --speed must be positive")
+        return 1
+    if not Path(args.trace).exists():
+        print(f"❌ {args.trace} not found")
+        return 1
+    trace = load_trace(args.trace)
+    if args.limit:
+        trace = trace[:args.limit]
+    if not trace:
+        print(f"❌ No replayable requests in {args.trace}")
+        return 1
+    if args.concurrency:
+        config["open_loop_max_inflight"] = args.concurrency
+    
+    keep_timing = not args.no_timing
+    session_dir = TEMP_DIR / datetime.now().strftime("%Y%m%d_%H%M%S")
+    print(f"🔁 Replaying {len(trace)} request(s) from {args.trace} against {target['label']} ({target['url']})")
+    print(f"⏱️  {f'original timing x{1 / args.speed:g}' if keep_timing else 'no timing, back to back'}, "
+          f"max {config['open_loop_max_inflight']} in flight\n")
+    report = run_replay(trace, target["backend"], target["url"], session_dir, config,
+                        model=args.model, speed=args.speed, keep_timing=keep_timing)
+    print(f"\n✅ {format_replay_report(report)}")
+    save_replay_result(target["backend"], args.model, args.trace, args.speed, keep_timing, report)
+    if report["requests"]:
+        write_performance_summary(session_dir / "performans.txt",
+                                  [(args.model or "(trace models)", f"replay {Path(args.trace).name}", report)])
+    print(f"💾 Session {session_dir.name} (compare it with: compare <baseline> {session_dir.name} --mode replay)")
+    return 1 if report["errors"] else 0
+
+def main():
+    parser = argparse.ArgumentParser(description="LLM Speed Benchmark Tool")
+    subparsers = parser.add_subparsers(dest="command")
+    
+    run_parser = subparsers.add_parser("run", help="run a benchmark matrix without the interactive menu")
+    run_parser.add_argument("matrix", help="JSON or YAML matrix file")
+    run_parser.add_argument("--dry-run", action="store_true", help="list the runs without executing them")
+    
+    query_parser = subparsers.add_parser("query", help="query the structured results store")
+    add_run_filter_args(query_parser)
+    query_parser.add_argument("--group-by", default="backend,model,prompt_file",
+                              help="comma separated columns to aggregate by (default: backend,model,prompt_file)")
+    query_parser.add_argument("--raw", action="store_true", help="list individual runs instead of aggregates")
+    query_parser.add_argument("--limit", type=int, default=50)
+    
+    compare_parser = subparsers.add_parser("compare", help="compare two result sets and flag regressions")
+    compare_parser.add_argument("baseline", help="session id, git:<rev> or <since>..<until>")
+    compare_parser.add_argument("candidate", help="session id, git:<rev> or <since>..<until>")
+    add_run_filter_args(compare_parser)
+    compare_parser.add_argument("--metric", choices=list(COMPARE_METRICS), default="decode_tps")
+    compare_parser.add_argument("--threshold", type=float, default=5.0,
+                                help="minimum change in percent to flag (default: 5)")
+    compare_parser.add_argument("--confidence", type=float, default=0.95)
+    
+    report_parser = subparsers.add_parser("report", help="build an HTML/CSV report with charts over the run history")
+    add_run_filter_args(report_parser)
+    report_parser.add_argument("--output", help="output directory (default: temp/report)")
+    
+    tokenize_parser = subparsers.add_parser("tokenize", help="fill the token index with exact prompt token counts")
+    tokenize_parser.add_argument("backend", help="ollama, llamacpp, lmstudio or a remote server name")
+    tokenize_parser.add_argument("model")
+    tokenize_parser.add_argument("prompts", nargs="*", help="prompt files (default: all)")
+    tokenize_parser.add_argument("--probe", action="store_true",
+                                 help="fall back to a one-token generation when there is no /tokenize endpoint")
+    
+    fleet_parser = subparsers.add_parser("fleet", help="benchmark every remote server in parallel and rank them")
+    fleet_parser.add_argument("prompts", nargs="*", help="prompt files (default: all)")
+    fleet_parser.add_argument("--models", nargs="*", help="only models containing one of these substrings")
+    fleet_parser.add_argument("--concurrency", type=int, help="max concurrent tests per server")
+    
+    embed_parser = subparsers.add_parser("embed", help="benchmark embedding throughput over batch sizes")
+    embed_parser.add_argument("backend", help="ollama, llamacpp, lmstudio or a remote server name")
+    embed_parser.add_argument("model")
+    embed_parser.add_argument("prompts", nargs="*", help="prompt files to chunk (default: all)")
+    embed_parser.add_argument("--batch-sizes", type=int, nargs="+", help="default: embed_batch_sizes")
+    embed_parser.add_argument("--chunk-sizes", type=int, nargs="+", help="chunk sizes in tokens (default: embed_chunk_sizes)")
+    embed_parser.add_argument("--concurrency", type=int, help="requests in flight (default: embed_concurrency)")
+    
+    daemon_parser = subparsers.add_parser("daemon", help="run probe_set periodically and export Prometheus metrics")
+    daemon_parser.add_argument("--port", type=int, help="metrics port (default: metrics_port)")
+    daemon_parser.add_argument("--interval", type=float, help="seconds between probe cycles (default: probe_interval)")
+    
+    replay_parser = subparsers.add_parser("replay", help="re-drive recorded .req requests with their original timing")
+    replay_parser.add_argument("trace", help="directory of .req files (e.g. temp/<session>) or a JSONL trace")
+    replay_parser.add_argument("backend", help="ollama, llamacpp, lmstudio or a remote server name")
+    replay_parser.add_argument("--model", help="send every request to this model (default: the recorded model)")
+    replay_parser.add_argument("--speed", type=float, default=1.0,
+                               help="time scale, 2 replays twice as fast (default: 1)")
+    replay_parser.add_argument("--no-timing", action="store_true",
+                               help="ignore the recorded gaps and send as fast as --concurrency allows")
+    replay_parser.add_argument("--concurrency", type=int, help="max requests in flight (default: open_loop_max_inflight)")
+    replay_parser.add_argument("--limit", type=int, help="only the first N requests")
+    
+    args = parser.parse_args()
     config = load_config()
+    configure_http(config)
+    configure_artifacts(config)
+    
+    if args.command == "run":
+        sys.exit(run_matrix(load_matrix(args.matrix), config, dry_run=args.dry_run))
+    if args.command == "query":
+        sys.exit(query_runs(args))
+    if args.command == "compare":
+        sys.exit(compare_runs(args))
+    if args.command == "report":
+        sys.exit(generate_report(args))
+    if args.command == "tokenize":
+        sys.exit(tokenize_prompts(args, config))
+    if args.command == "embed":
+        sys.exit(embed_command(args, config))
+    if args.command == "replay":
+        sys.exit(replay_trace(args, config))
+    if args.command == "daemon":
+        if args.port:
+            config["metrics_port"] = args.port
+        if args.interval:
+            config["probe_interval"] = args.interval
+        sys.exit(run_daemon(config))
+    if args.command == "fleet":
+        if not config["remote_servers"]:
+            sys.exit("❌ No remote_servers configured")
+        if args.concurrency:
+            config["fleet_server_concurrency"] = args.concurrency
+        session_dir = TEMP_DIR / datetime.now().strftime("%Y%m%d_%H%M%S")
+        _, failures = run_fleet(config["remote_servers"], args.prompts or get_prompts(), session_dir, config,
+                                model_filter=args.models)
+        sys.exit(1 if failures else 0)
+    
+    load_readchar()
     try:
         main_menu(config)
     except KeyboardInterrupt:
         pass
     save_config(config)
     print("\n👋 Goodbye!")
+
+if __name__ == "__main__":
+    main()